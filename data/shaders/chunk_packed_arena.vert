@@ -0,0 +1,39 @@
+#version 330
+
+uniform mat4 view_projection;
+uniform vec2 tile_size;
+
+// bits 0-14: chunk position (5 bits per axis), 15-17: face, 18-25: block map id
+in uint data;
+// per draw chunk position (xyz) and scale (w), fetched through the draw's base instance
+in vec4 chunk_offset;
+out vec2 frag_uv;
+out vec2 frag_tile;
+out vec3 frag_normal;
+out vec3 frag_position;
+
+// faces follow N6_OFFSETS (front, back, right, left, top, bottom)
+const vec3 FACE_NORMALS[6] = vec3[6](
+  vec3(0.0, 0.0, 1.0),
+  vec3(0.0, 0.0, -1.0),
+  vec3(1.0, 0.0, 0.0),
+  vec3(-1.0, 0.0, 0.0),
+  vec3(0.0, 1.0, 0.0),
+  vec3(0.0, -1.0, 0.0)
+);
+const int FACE_TILE_COLUMNS[6] = int[6](2, 3, 4, 5, 0, 1);
+const ivec2 FACE_UV_AXES[6] = ivec2[6](ivec2(0, 1), ivec2(0, 1), ivec2(2, 1), ivec2(2, 1), ivec2(0, 2), ivec2(0, 2));
+
+void main() {
+  vec3 vert = vec3(float(data & 31u), float((data >> 5) & 31u), float((data >> 10) & 31u));
+  int face = int((data >> 15) & 7u);
+  float block = float((data >> 18) & 255u);
+
+  vec4 world_position = vec4(vert * chunk_offset.w + chunk_offset.xyz, 1.0);
+
+  frag_uv = vec2(vert[FACE_UV_AXES[face].x], vert[FACE_UV_AXES[face].y]);
+  frag_tile = vec2(float(FACE_TILE_COLUMNS[face]), 1.0 / tile_size.y - 1.0 - block) * tile_size;
+  frag_normal = FACE_NORMALS[face];
+  frag_position = world_position.xyz;
+  gl_Position = view_projection * world_position;
+}
\ No newline at end of file
@@ -0,0 +1,24 @@
+#version 330
+
+uniform mat4 world_transform;
+uniform mat4 view_projection;
+
+in vec3 vert;
+in vec2 uv;
+in vec3 normal;
+in vec2 tile;
+out vec2 frag_uv;
+out vec2 frag_tile;
+out vec3 frag_normal;
+out vec3 frag_position;
+
+void main() {
+  vec4 world_position = world_transform * vec4(vert, 1.0);
+  mat4 normal_matrix = transpose(inverse(world_transform));
+
+  frag_uv = uv;
+  frag_tile = tile;
+  frag_normal = normalize((normal_matrix * vec4(normalize(normal), 0.0)).xyz);
+  frag_position = world_position.xyz;
+  gl_Position = view_projection * world_position;
+}
\ No newline at end of file
@@ -0,0 +1,24 @@
+#version 330
+
+uniform mat4 view_projection;
+
+in vec3 vert;
+in vec2 uv;
+in vec3 normal;
+in vec2 tile;
+// per draw chunk position (xyz) and scale (w), fetched through the draw's base instance
+in vec4 chunk_offset;
+out vec2 frag_uv;
+out vec2 frag_tile;
+out vec3 frag_normal;
+out vec3 frag_position;
+
+void main() {
+  vec4 world_position = vec4(vert * chunk_offset.w + chunk_offset.xyz, 1.0);
+
+  frag_uv = uv;
+  frag_tile = tile;
+  frag_normal = normalize(normal);
+  frag_position = world_position.xyz;
+  gl_Position = view_projection * world_position;
+}
@@ -0,0 +1,5 @@
+#version 330
+
+// depth pre-pass, color writes are masked off while it runs
+void main() {
+}
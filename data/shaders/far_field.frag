@@ -0,0 +1,165 @@
+#version 450
+
+uniform sampler2D tex;
+uniform mat4 view_projection;
+uniform mat4 inverse_view_projection;
+uniform vec3 world_light_pos;
+uniform vec3 eye_pos;
+uniform vec2 tile_size;
+uniform float ambient_strength = 0.5;
+uniform float light_strength = 1.25;
+
+// first chunk of the grid and its size in chunks
+uniform ivec3 grid_min;
+uniform ivec3 grid_size;
+// cells per brick axis and the world size of a cell and a chunk
+uniform int brick_size;
+uniform float cell_scale;
+uniform float chunk_scale;
+// chunks whose center is within near_distance of the eye are rasterized instead
+uniform float near_distance;
+uniform int max_steps;
+
+// brick index + 1 per chunk indexed [x][y][z] (0 for chunks without blocks)
+layout(std430, binding = 0) readonly buffer Grid {
+  uint grid[];
+};
+
+// brick_size^3 cells per brick indexed [x][y][z], BLOCK_MAP id + 1 packed 4 per uint
+layout(std430, binding = 1) readonly buffer Bricks {
+  uint bricks[];
+};
+
+// one bit per 4x4x4 group of cells in each brick
+layout(std430, binding = 2) readonly buffer Masks {
+  uvec2 masks[];
+};
+
+in vec2 ndc;
+out vec4 f_color;
+
+// faces follow N6_OFFSETS (front, back, right, left, top, bottom)
+const vec3 FACE_NORMALS[6] = vec3[6](
+  vec3(0.0, 0.0, 1.0),
+  vec3(0.0, 0.0, -1.0),
+  vec3(1.0, 0.0, 0.0),
+  vec3(-1.0, 0.0, 0.0),
+  vec3(0.0, 1.0, 0.0),
+  vec3(0.0, -1.0, 0.0)
+);
+const int FACE_TILE_COLUMNS[6] = int[6](2, 3, 4, 5, 0, 1);
+const ivec2 FACE_UV_AXES[6] = ivec2[6](ivec2(0, 1), ivec2(0, 1), ivec2(2, 1), ivec2(2, 1), ivec2(0, 2), ivec2(0, 2));
+// face with the positive normal along x, y and z (the negative one follows it)
+const int AXIS_FACES[3] = int[3](2, 4, 0);
+
+uint brick_at(ivec3 chunk) {
+  if (any(lessThan(chunk, ivec3(0))) || any(greaterThanEqual(chunk, grid_size))) {
+    return 0u;
+  }
+  uint brick = grid[(chunk.x * grid_size.y + chunk.y) * grid_size.z + chunk.z];
+  vec3 center = (vec3(chunk + grid_min) + 0.5) * chunk_scale;
+  return distance(center, eye_pos) > near_distance ? brick : 0u;
+}
+
+bool group_occupied(uint brick, ivec3 local) {
+  int groups = brick_size / 4;
+  ivec3 group = local / 4;
+  int bit = (group.x * groups + group.y) * groups + group.z;
+  uvec2 mask = masks[brick - 1u];
+  return (((bit < 32) ? (mask.x >> bit) : (mask.y >> (bit - 32))) & 1u) != 0u;
+}
+
+uint cell_value(uint brick, ivec3 local) {
+  uint index = (brick - 1u) * uint(brick_size * brick_size * brick_size) + uint((local.x * brick_size + local.y) * brick_size + local.z);
+  return (bricks[index >> 2] >> ((index & 3u) * 8u)) & 255u;
+}
+
+void main() {
+  vec4 near_point = inverse_view_projection * vec4(ndc, -1.0, 1.0);
+  vec4 far_point = inverse_view_projection * vec4(ndc, 1.0, 1.0);
+  near_point /= near_point.w;
+  far_point /= far_point.w;
+
+  // everything below is in cells relative to the grid's first cell
+  vec3 grid_offset = vec3(grid_min * brick_size);
+  vec3 origin = near_point.xyz / cell_scale - grid_offset;
+  vec3 dir = normalize(far_point.xyz - near_point.xyz);
+  dir = mix(dir, vec3(1e-7), lessThan(abs(dir), vec3(1e-7)));
+  vec3 inv_dir = 1.0 / dir;
+
+  vec3 box_size = vec3(grid_size * brick_size);
+  vec3 t0 = -origin * inv_dir;
+  vec3 t1 = (box_size - origin) * inv_dir;
+  vec3 t_enter = min(t0, t1);
+  float t_max = min(min(max(t0, t1).x, max(t0, t1).y), max(t0, t1).z);
+
+  // no far field chunk reaches closer than its center minus half its diagonal
+  float t_start = max(0.0, (near_distance - chunk_scale * 0.87) / cell_scale - 1.0);
+  float t = max(max(max(t_enter.x, t_enter.y), t_enter.z), t_start);
+  if (t >= t_max) {
+    discard;
+  }
+  int axis = (t_enter.x > t_enter.y) ? ((t_enter.x > t_enter.z) ? 0 : 2) : ((t_enter.y > t_enter.z) ? 1 : 2);
+
+  ivec3 cell = clamp(ivec3(floor(origin + dir * t)), ivec3(0), ivec3(box_size) - 1);
+  uint value = 0u;
+  for (int i = 0; i < max_steps; i++) {
+    // steps over an empty chunk, an empty group of 4 cells or a single cell
+    ivec3 chunk = cell / brick_size;
+    uint brick = brick_at(chunk);
+    int step_size = brick_size;
+    if (brick != 0u) {
+      ivec3 local = cell - chunk * brick_size;
+      step_size = 4;
+      if (group_occupied(brick, local)) {
+        value = cell_value(brick, local);
+        if (value != 0u) {
+          break;
+        }
+        step_size = 1;
+      }
+    }
+
+    ivec3 low = (cell / step_size) * step_size;
+    vec3 bound = vec3(low) + mix(vec3(0.0), vec3(float(step_size)), greaterThan(dir, vec3(0.0)));
+    vec3 t_exit = (bound - origin) * inv_dir;
+    axis = (t_exit.x < t_exit.y) ? ((t_exit.x < t_exit.z) ? 0 : 2) : ((t_exit.y < t_exit.z) ? 1 : 2);
+    t = t_exit[axis];
+    if (t >= t_max) {
+      discard;
+    }
+
+    // the exit axis lands on the next box, the others stay within the box being left
+    cell = clamp(ivec3(floor(origin + dir * t)), low, low + step_size - 1);
+    cell[axis] = (dir[axis] > 0.0) ? int(bound[axis]) : int(bound[axis]) - 1;
+  }
+  if (value == 0u) {
+    discard;
+  }
+
+  // the hit face points back along the ray
+  int face = AXIS_FACES[axis] + ((dir[axis] > 0.0) ? 1 : 0);
+
+  vec3 cell_position = origin + dir * t;
+  vec3 frag_position = (cell_position + grid_offset) * cell_scale;
+  vec4 clip_position = view_projection * vec4(frag_position, 1.0);
+  float depth = clip_position.z / clip_position.w * 0.5 + 0.5;
+  if (depth > 1.0) {
+    discard;
+  }
+  gl_FragDepth = depth;
+
+  // same shading as chunk.frag (chunk meshes have no normal or metallic maps)
+  vec2 frag_uv = vec2(cell_position[FACE_UV_AXES[face].x], cell_position[FACE_UV_AXES[face].y]);
+  vec2 frag_tile = vec2(float(FACE_TILE_COLUMNS[face]), 1.0 / tile_size.y - 1.0 - float(value - 1u)) * tile_size;
+  float bias = 0.00001;
+  vec2 atlas_uv = frag_tile + bias + fract(frag_uv) * (tile_size - bias * 2.0);
+  vec4 base_color = texture(tex, atlas_uv);
+
+  vec3 light_vec = normalize(world_light_pos);
+  vec3 normal = FACE_NORMALS[face];
+  vec4 ambient = ambient_strength * base_color;
+  vec4 diffuse = base_color * clamp(dot(light_vec, normal), 0.0, 1.0) * (1.0 - ambient_strength) * light_strength;
+
+  f_color = vec4(diffuse.rgb + ambient.rgb, 1.0);
+}
\ No newline at end of file
@@ -0,0 +1,9 @@
+#version 330
+
+out vec2 ndc;
+
+// one triangle covering the screen, no vertex buffer needed
+void main() {
+  ndc = vec2(float((gl_VertexID & 1) * 4 - 1), float((gl_VertexID & 2) * 2 - 1));
+  gl_Position = vec4(ndc, 0.0, 1.0);
+}
\ No newline at end of file
@@ -88,5 +88,6 @@ BULLET_STATS = {
         'helmet_pen': 0.75,  # Helmet penetration multiplier
         'helmet_dmg': 1,     # Damage dealt to helmeted targets
         'damage': 20,        # Base body damage per hit
+        'block_damage': 1,   # Durability removed from a block per hit (destructible terrain)
     }
 }
@@ -48,6 +48,9 @@ class Elements:
         else:
             self.elems['duplicates'][elem._name].append(elem)
         
+    def __contains__(self, key):
+        return key in self.elems['singletons']
+
     # no error handling here to save on performance
     def __getitem__(self, key):
         return self.elems['singletons'][key]
@@ -16,6 +16,9 @@ class MGL(ElementSingleton):
 
     def program(self, vert_path, frag_path):
         return self.ctx.program(vertex_shader=read_f(vert_path), fragment_shader=read_f(frag_path))
+
+    def compute_shader(self, path):
+        return self.ctx.compute_shader(read_f(path))
     
     def load_texture(self, path, swizzle=True):
         img = Image.open(path).convert('RGBA').transpose(Image.FLIP_TOP_BOTTOM)
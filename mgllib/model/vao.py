@@ -57,6 +57,16 @@ class VAOs:
         for vao in self.vaos:
             vao.render(mode=mode)
 
+    def render_indirect(self, buffer, count, uniforms={}, mode=moderngl.TRIANGLES):
+        """
+        Renders all VAOs with draw commands read from a GPU buffer.
+        Each VAO issues a single multi draw call covering `count` commands.
+        """
+        self.update(uniforms=uniforms)
+
+        for vao in self.vaos:
+            vao.render_indirect(buffer, mode=mode, count=count)
+
 
 # -------------------------------------------------------------------------------
 # TexturedVAOs Class
@@ -94,9 +104,8 @@ class TexturedVAOs(VAOs):
             # Store the texture reference
             self.textures[category] = texture
 
-    def render(self, uniforms={}, mode=moderngl.TRIANGLES):
+    def texture_uniforms(self, uniforms):
         """
-        Prepares all textures as uniforms, then calls parent render method.
         Automatically adds entries to the uniforms dict for each texture.
         """
         # Add texture objects to uniform dictionary
@@ -117,5 +126,18 @@ class TexturedVAOs(VAOs):
         if not self.simple:
             uniforms['texture_flags'] = self.texture_flags
 
+    def render(self, uniforms={}, mode=moderngl.TRIANGLES):
+        """
+        Prepares all textures as uniforms, then calls parent render method.
+        """
+        self.texture_uniforms(uniforms)
+
         # Call base VAO renderer to actually draw geometry
         super().render(uniforms=uniforms, mode=mode)
+
+    def render_indirect(self, buffer, count, uniforms={}, mode=moderngl.TRIANGLES):
+        """
+        Prepares all textures as uniforms, then calls parent indirect render method.
+        """
+        self.texture_uniforms(uniforms)
+        super().render_indirect(buffer, count, uniforms=uniforms, mode=mode)
@@ -5,6 +5,7 @@ import glm
 
 from .entity import Entity
 from .spark import Spark
+from .const import BULLET_STATS
 
 class Tracer(Entity):
     def __init__(self, base_obj, bullet_type, pos, rotation):
@@ -46,8 +47,11 @@ class Tracer(Entity):
                 self.create_blood(6)
                 return True
             
-        if self.e['World'].check_block(self.pos):
+        block = self.e['World'].check_block(self.pos)
+        if block:
             self.e['Sounds'].play_from('bullet_collide', position=self.pos)
+            if self.e['World'].destructible:
+                self.e['World'].damage_block(block.world_pos, BULLET_STATS[self.type]['block_damage'])
             return True
         
     def destroy(self, collision=False):
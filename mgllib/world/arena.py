@@ -0,0 +1,153 @@
+import bisect
+
+import numpy as np
+
+from ..elements import Element
+from ..model.vao import TexturedVAOs, VAOs
+from .block import CACHE
+from .mesher import used_layout, QUAD_CORNERS, QUAD_TRIANGLES
+from .const import CHUNK_FORMATS, CHUNK_VERTEX_BYTES, CHUNK_ARENA_SHADERS, DEPTH_FRAGMENT_SHADER
+
+# vertices reserved up front (grows by doubling)
+ARENA_START_VERTICES = 1 << 18
+
+class ChunkArena(Element):
+    def __init__(self, world, capacity=ARENA_START_VERTICES):
+        # every chunk mesh lives in one buffer so all visible terrain draws with one multi draw indirect call
+        # ranges are in vertices and handed out first fit from a sorted free list
+        super().__init__()
+
+        self.world = world
+        self.ctx = self.e['MGL'].ctx
+        self.vertex_bytes = CHUNK_VERTEX_BYTES[world.vertex_format]
+        self.capacity = capacity
+        self.buffer = self.ctx.buffer(reserve=self.capacity * self.vertex_bytes)
+        self.free_starts = [0]
+        self.free_sizes = [self.capacity]
+        self.used = 0
+
+        self.program = self.e['MGL'].program(*CHUNK_ARENA_SHADERS[world.vertex_format])
+        self.depth_program = self.e['MGL'].program(CHUNK_ARENA_SHADERS[world.vertex_format][0], DEPTH_FRAGMENT_SHADER)
+
+        # one (x, y, z, scale) row per draw, indexed with the draw's base instance
+        self.instance_buffer = self.ctx.buffer(reserve=16 * 64)
+        self.command_buffer = self.ctx.buffer(reserve=20 * 64)
+        self.tvaos = None
+        self.depth_vaos = None
+        self.build_vao()
+
+    def build_vao(self):
+        # the vao has to be rebuilt whenever the arena buffer is replaced by a bigger one
+        if self.tvaos:
+            self.tvaos.vaos[0].release()
+            self.depth_vaos.vaos[0].release()
+        self.tvaos = TexturedVAOs(self.program, [self.vertex_array(self.program)])
+        self.tvaos.bind_texture(CACHE['texture'], 'texture')
+        self.depth_vaos = VAOs(self.depth_program, [self.vertex_array(self.depth_program)])
+
+    def vertex_array(self, program):
+        content = [(self.buffer, *used_layout(program, CHUNK_FORMATS[self.world.vertex_format])), (self.instance_buffer, '4f/i', 'chunk_offset')]
+        if self.world.indexed:
+            return self.ctx.vertex_array(program, content, index_buffer=self.world.index_buffer, index_element_size=4)
+        return self.ctx.vertex_array(program, content)
+
+    def grow(self, vertex_count):
+        capacity = self.capacity
+        while capacity - self.capacity < vertex_count:
+            capacity *= 2
+
+        buffer = self.ctx.buffer(reserve=capacity * self.vertex_bytes)
+        self.ctx.copy_buffer(buffer, self.buffer)
+        self.buffer.release()
+        self.buffer = buffer
+        self.free_range(self.capacity, capacity - self.capacity)
+        self.capacity = capacity
+        self.build_vao()
+
+    def allocate(self, content):
+        # returns the first vertex of the range the content was written to
+        start = self.reserve(len(content))
+        self.buffer.write(np.ascontiguousarray(content), offset=start * self.vertex_bytes)
+        return start
+
+    def allocate_from(self, buffer, vertex_count, read_offset=0):
+        # same as allocate() for vertices already on the GPU (offsets in vertices)
+        start = self.reserve(vertex_count)
+        self.ctx.copy_buffer(self.buffer, buffer, size=vertex_count * self.vertex_bytes, read_offset=read_offset * self.vertex_bytes, write_offset=start * self.vertex_bytes)
+        return start
+
+    def reserve(self, vertex_count):
+        for i, size in enumerate(self.free_sizes):
+            if size >= vertex_count:
+                break
+        else:
+            self.grow(vertex_count)
+            return self.reserve(vertex_count)
+
+        start = self.free_starts[i]
+        if size == vertex_count:
+            del self.free_starts[i]
+            del self.free_sizes[i]
+        else:
+            self.free_starts[i] += vertex_count
+            self.free_sizes[i] -= vertex_count
+
+        self.used += vertex_count
+        return start
+
+    def free(self, start, vertex_count):
+        self.used -= vertex_count
+        self.free_range(start, vertex_count)
+
+    def free_range(self, start, vertex_count):
+        # merges with the free ranges on either side
+        i = bisect.bisect(self.free_starts, start)
+        if i and (self.free_starts[i - 1] + self.free_sizes[i - 1] == start):
+            i -= 1
+            self.free_sizes[i] += vertex_count
+        else:
+            self.free_starts.insert(i, start)
+            self.free_sizes.insert(i, vertex_count)
+        if (i + 1 < len(self.free_starts)) and (self.free_starts[i] + self.free_sizes[i] == self.free_starts[i + 1]):
+            self.free_sizes[i] += self.free_sizes.pop(i + 1)
+            del self.free_starts[i + 1]
+
+    @property
+    def memory_usage(self):
+        return self.buffer.size + self.instance_buffer.size + self.command_buffer.size
+
+    def write_buffer(self, name, data):
+        buffer = getattr(self, name)
+        if buffer.size < len(data):
+            # orphaning keeps the buffer's name so the vao stays valid
+            buffer.orphan(len(data) * 2)
+        buffer.write(data)
+
+    def render(self, draws, uniforms={}, depth_only=False):
+        # draws are (first vertex, vertex count, (x, y, z, scale)) and are submitted in one call
+        if not draws:
+            return
+
+        self.write_buffer('instance_buffer', np.array([draw[2] for draw in draws], dtype=np.float32).tobytes())
+
+        # moderngl reads both command layouts with a 20 byte stride
+        commands = np.zeros((len(draws), 5), dtype=np.uint32)
+        starts = np.array([draw[0] for draw in draws], dtype=np.uint32)
+        counts = np.array([draw[1] for draw in draws], dtype=np.uint32)
+        commands[:, 1] = 1
+        if self.world.indexed:
+            # (index count, instances, first index, base vertex, base instance)
+            commands[:, 0] = counts // len(QUAD_CORNERS) * len(QUAD_TRIANGLES)
+            commands[:, 3] = starts
+            commands[:, 4] = np.arange(len(draws))
+        else:
+            # (vertex count, instances, first vertex, base instance, unused)
+            commands[:, 0] = counts
+            commands[:, 2] = starts
+            commands[:, 3] = np.arange(len(draws))
+        self.write_buffer('command_buffer', commands.tobytes())
+
+        if depth_only:
+            self.depth_vaos.render_indirect(self.command_buffer, len(draws), uniforms=uniforms)
+        else:
+            self.tvaos.render_indirect(self.command_buffer, len(draws), uniforms=uniforms)
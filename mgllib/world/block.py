@@ -23,6 +23,17 @@ BLOCK_MAP = {
     'dirt': 3,
 }
 
+# bullet damage each block type takes before it breaks in destructible worlds (see World.damage_block())
+BLOCK_DURABILITY = {
+    'chiseled_stone': 6,
+    'log': 4,
+    'grass': 2,
+    'dirt': 2,
+}
+
+# BLOCK_MAP id -> block id
+BLOCK_IDS = sorted(BLOCK_MAP, key=BLOCK_MAP.get)
+
 BLOCK_CACHE = {}
 
 N6_OFFSETS = [(0, 0, 1), (0, 0, -1), (1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0)]
@@ -87,20 +98,21 @@ class BlockReferenceGeometry(Element):
                 data_buffer += [point[0] + chunk_pos[0], point[1] + chunk_pos[1], point[2] + chunk_pos[2], *point[3:]]
         return data_buffer
     
-class ChunkBlock(Element):
-    def __init__(self, parent, block_id='chiseled_stone', chunk_pos=(0, 0, 0)):
-        super().__init__()
+# lightweight view of a single voxel in a chunk's dense storage
+# these are created on demand by lookups and are not stored by the chunk
+class ChunkBlock:
+    __slots__ = ['chunk', 'block_id', 'chunk_pos', 'world_pos', 'scaled_world_pos', 'scale']
 
+    def __init__(self, parent, block_id='chiseled_stone', chunk_pos=(0, 0, 0)):
         self.chunk = parent
         self.block_id = block_id
         self.chunk_pos = chunk_pos
 
-        self.world_pos = tuple(v + self.chunk_pos[i] for i, v in enumerate(self.chunk.world_offset))
-        self.scaled_world_pos = tuple(v * BLOCK_SCALE for v in self.world_pos)
+        offset = self.chunk.world_offset
+        self.world_pos = (offset[0] + chunk_pos[0], offset[1] + chunk_pos[1], offset[2] + chunk_pos[2])
+        self.scaled_world_pos = (self.world_pos[0] * BLOCK_SCALE, self.world_pos[1] * BLOCK_SCALE, self.world_pos[2] * BLOCK_SCALE)
         self.scale = BLOCK_SCALE
 
-        self.generate()
-
     @property
     def neighbors(self):
         return [tuple(self.world_pos[i] + v for i, v in enumerate(offset)) for offset in N6_OFFSETS]
@@ -109,8 +121,9 @@ class ChunkBlock(Element):
     def empty_neighbor_flags(self):
         return [int(not bool(self.chunk.world.get_block(neighbor))) for neighbor in self.neighbors]
 
-    def generate(self):
-        self.buffer = BLOCK_CACHE[self.block_id].localize(chunk_pos=self.chunk_pos, side_flags=self.empty_neighbor_flags)
+    @property
+    def buffer(self):
+        return BLOCK_CACHE[self.block_id].localize(chunk_pos=self.chunk_pos, side_flags=self.empty_neighbor_flags)
 
 def populate_block_cache():
     for block_id in BLOCK_MAP:
@@ -1,11 +1,19 @@
-from array import array
+import zlib
+
+import numpy as np
 
 from ..elements import Element
-from .block import ChunkBlock, CACHE, N7_OFFSETS
-from ..model.vao import TexturedVAOs
+from .block import ChunkBlock, CACHE, BLOCK_MAP, BLOCK_IDS, N6_OFFSETS
+from .mesher import slot_vertices, exposed_faces, downsample_rows, lod_halo, used_layout, QUAD_CORNERS, QUAD_TRIANGLES
+from .visibility import face_connectivity
+from ..model.vao import VAOs, TexturedVAOs
 from ..mat3d import Transform3D
 from .decor import DecorGroup
-from .const import CHUNK_SIZE, BLOCK_SCALE
+from .const import CHUNK_SIZE, BLOCK_SCALE, CHUNK_VERTEX_BYTES
+
+# slot buffers start with room for this many blocks and leave headroom for edits
+MIN_SLOTS = 64
+SLOT_HEADROOM = 1.5
 
 class Chunk(Element):
     def __init__(self, parent, chunk_id):
@@ -14,17 +22,76 @@ class Chunk(Element):
         self.world = parent
         self.chunk_id = chunk_id
         self.world_offset = tuple(self.chunk_id[i] * CHUNK_SIZE for i in range(3))
-        self.program = self.world.program
+        self.program = self.world.chunk_program
 
         self.transform = Transform3D()
         self.transform.pos = [v * BLOCK_SCALE for v in self.world_offset]
         self.transform.scale = [BLOCK_SCALE, BLOCK_SCALE, BLOCK_SCALE]
+        self.center = tuple((v + CHUNK_SIZE * 0.5) * BLOCK_SCALE for v in self.world_offset)
+
+        # frame index of the last time this chunk was drawn (used to prioritize rebuilds)
+        self.last_rendered = -1
+
+        # streaming worlds only keep GPU resources for chunks near the player (the voxels always stay)
+        self.resident = not self.world.stream_radius
+        self.world.resident_count += self.resident
+
+        # bytes last added to world.gpu_bytes for this chunk (see account_gpu_bytes())
+        self.gpu_bytes = 0
+
+        # world space AABBs as (min, max) for the blocks, the decor and both combined (None when empty)
+        self.block_bounds = None
+        self.decor_bounds = None
+        self.bounds = None
+
+        # dense block storage indexed by chunk-local (x, y, z)
+        # values index into the palette and 0 is always air
+        self._voxels = np.zeros((CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+        self.voxel_loader = None
 
-        # absolute position is used for blocks to speed up lookups
-        self.blocks = {}
+        # RegionFile the voxels are mapped from until an edit (or detach_region()) copies them
+        self.region_file = None
+
+        # cold chunks drop their dense voxels and keep only a zlib copy (see compress())
+        self.compressed_bytes = 0
+        self.voxel_frame = self.world.frame_index
+        self.world.expanded_chunks.add(self)
+        self.palette = [None]
+        self.palette_lookup = {None: 0}
+        self.block_count = 0
+        self.world.occupancy.add(self)
+        self.world.voxels_changed(self)
+
+        # 6x6 table of which faces (N6_OFFSETS order) see each other through air (None until computed)
+        self.visibility = None
 
         self.tvaos = None
         self.buffer = None
+        self.vertex_count = 0
+
+        # bumped whenever a new mesh is requested so stale worker results can be dropped
+        self.mesh_generation = 0
+
+        # first vertex of the mesh in the world's ChunkArena ('arena' buffer mode)
+        self.arena_start = None
+
+        # downsampled meshes keyed by factor as (buffer, TexturedVAOs, vertex count, arena start)
+        # the world's rebuild scheduler builds them once they're wanted, and edits leave them drawing (stale)
+        # until their replacement is uploaded, queued_lods holds the factors waiting on the scheduler or a worker
+        self.lods = {}
+        self.lod_transforms = {}
+        self.stale_lods = set()
+        self.queued_lods = set()
+        self.lod_generation = 0
+
+        # (buffer, VAOs) for the world's depth pre-pass program keyed by lod, remade when the buffer changes
+        self.depth_vaos = {}
+
+        # slot buffer mode: every solid block owns 6 faces at a fixed offset in one persistent buffer
+        self.slots = None
+        self.free_slots = []
+        self.slot_count = 0
+        self.slot_capacity = 0
 
         self.changes_since_rebuild = set()
 
@@ -37,6 +104,137 @@ class Chunk(Element):
             self.decor[group] = []
         self.decor[group].append(decor)
 
+    @property
+    def voxels(self):
+        # chunks loaded from a region file or compressed map or inflate their voxels the first time they're read
+        # the loader is kept while the voxels are read only so a clean chunk can be dropped again for free
+        if self._voxels is None:
+            self._voxels = self.voxel_loader()
+            self.world.expanded_chunks.add(self)
+        self.voxel_frame = self.world.frame_index
+        return self._voxels
+
+    @voxels.setter
+    def voxels(self, voxels):
+        self._voxels = voxels
+        self.voxel_loader = None
+        self.compressed_bytes = 0
+        self.region_file = None
+
+    def load_voxels(self, loader, palette, block_count, region_file=None):
+        self._voxels = None
+        self.voxel_loader = loader
+        self.region_file = region_file
+        self.compressed_bytes = 0
+        self.world.expanded_chunks.discard(self)
+        self.palette = [None] + list(palette)
+        self.palette_lookup = {block_id: i for i, block_id in enumerate(self.palette)}
+        self.block_count = block_count
+        self.visibility = None
+        self.world.occupancy.invalidate(self)
+        self.world.voxels_changed(self)
+
+    def detach_region(self):
+        # gives a chunk mapped from a region file its own copy of the voxels so the file can be closed
+        # (frame_update() compresses it again if it goes cold)
+        if self.region_file is not None:
+            self.voxels = np.array(self.voxels)
+
+    def writable_voxels(self):
+        # mapped and inflated voxels are read only, so the first edit copies them
+        if not self.voxels.flags.writeable:
+            self.voxels = self.voxels.copy()
+        return self.voxels
+
+    def compress(self):
+        # drops the dense voxels, edited ones are kept zlib compressed and clean ones just reload from their source
+        if self._voxels is None:
+            return
+        if self.voxel_loader is None:
+            data = zlib.compress(self._voxels.tobytes(), 1)
+            dtype = self._voxels.dtype
+            self.voxel_loader = lambda: np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+            self.compressed_bytes = len(data)
+        self._voxels = None
+        self.world.expanded_chunks.discard(self)
+
+    @property
+    def blocks(self):
+        # compatibility view keyed by absolute position (builds every block, so avoid in hot paths)
+        return {block.world_pos: block for block in self.iter_blocks()}
+
+    def iter_blocks(self):
+        for chunk_pos in zip(*np.nonzero(self.voxels)):
+            chunk_pos = (int(chunk_pos[0]), int(chunk_pos[1]), int(chunk_pos[2]))
+            yield ChunkBlock(self, block_id=self.palette[self.voxels[chunk_pos]], chunk_pos=chunk_pos)
+
+    def palette_index(self, block_id):
+        if block_id not in self.palette_lookup:
+            self.palette_lookup[block_id] = len(self.palette)
+            self.palette.append(block_id)
+            if (len(self.palette) > 256) and (self.voxels.dtype == np.uint8):
+                self.voxels = self.voxels.astype(np.uint16)
+        return self.palette_lookup[block_id]
+
+    @property
+    def row_lut(self):
+        # palette index -> BLOCK_MAP id with -1 for air
+        return np.array([-1] + [BLOCK_MAP[block_id] for block_id in self.palette[1:]], dtype=np.int16)
+
+    @property
+    def block_rows(self):
+        return self.row_lut[self.voxels]
+
+    def neighbor(self, axis, direction):
+        neighbor_id = list(self.chunk_id)
+        neighbor_id[axis] += direction
+        return self.world.chunks.get(tuple(neighbor_id))
+
+    def solid_halo(self):
+        # solidity of the chunk plus a one voxel border taken from the 6 face neighbors
+        halo = np.zeros((CHUNK_SIZE + 2, CHUNK_SIZE + 2, CHUNK_SIZE + 2), dtype=bool)
+        halo[1:-1, 1:-1, 1:-1] = self.voxels != 0
+        for axis in range(3):
+            for direction in (-1, 1):
+                neighbor = self.neighbor(axis, direction)
+                if neighbor:
+                    src = [slice(None)] * 3
+                    src[axis] = 0 if direction == 1 else CHUNK_SIZE - 1
+                    dst = [slice(1, -1)] * 3
+                    dst[axis] = CHUNK_SIZE + 1 if direction == 1 else 0
+                    halo[tuple(dst)] = neighbor.voxels[tuple(src)] != 0
+        return halo
+
+    @property
+    def face_visibility(self):
+        if self.visibility is None:
+            self.visibility = face_connectivity(self.voxels)
+        return self.visibility
+
+    def local_pos(self, world_pos):
+        return (world_pos[0] - self.world_offset[0], world_pos[1] - self.world_offset[1], world_pos[2] - self.world_offset[2])
+
+    @property
+    def memory_usage(self):
+        # read without inflating, mapped voxels cost nothing and a clean inflated chunk still holds its zlib copy
+        voxel_bytes = (self._voxels.nbytes if self._voxels is not None else 0) + self.compressed_bytes
+        return voxel_bytes + len(self.palette) * 8
+
+    @property
+    def gpu_memory_usage(self):
+        decor_bytes = sum(group.mgl_buffer.size for group in self.decor_vaos.values() if group.mgl_buffer)
+        if self.world.arena:
+            vertex_bytes = self.world.arena.vertex_bytes
+            return (self.vertex_count + sum(lod[2] for lod in self.lods.values())) * vertex_bytes + decor_bytes
+        lod_bytes = sum(lod[0].size for lod in self.lods.values() if lod[0])
+        return (self.buffer.size if self.buffer else 0) + decor_bytes + lod_bytes
+
+    def account_gpu_bytes(self):
+        # keeps the world's running total in step so streaming never has to sum every chunk
+        usage = self.gpu_memory_usage
+        self.world.gpu_bytes += usage - self.gpu_bytes
+        self.gpu_bytes = usage
+
     def release(self):
         if self.tvaos:
             for vao in self.tvaos.vaos:
@@ -45,31 +243,332 @@ class Chunk(Element):
         if self.buffer:
             self.buffer.release()
 
+        if self.arena_start is not None:
+            self.world.arena.free(self.arena_start, self.vertex_count)
+            self.arena_start = None
+
+        for buffer, vaos in self.depth_vaos.values():
+            vaos.vaos[0].release()
+        self.depth_vaos = {}
+
         self.tvaos = None
         self.buffer = None
-
-    def combine(self):
+        self.vertex_count = 0
+        self.slots = None
+        self.account_gpu_bytes()
+
+    def release_lod(self, factor):
+        if factor in self.lods:
+            buffer, tvaos, vertex_count, arena_start = self.lods.pop(factor)
+            if tvaos:
+                tvaos.vaos[0].release()
+                buffer.release()
+            if arena_start is not None:
+                self.world.arena.free(arena_start, vertex_count)
+        if factor in self.depth_vaos:
+            self.depth_vaos.pop(factor)[1].vaos[0].release()
+        self.account_gpu_bytes()
+
+    def release_lods(self):
+        # worker results still on their way are dropped through the generation check
+        for factor in list(self.lods):
+            self.release_lod(factor)
+        self.stale_lods = set()
+        self.queued_lods = set()
+        self.lod_generation += 1
+
+    def invalidate_lods(self):
+        # the built lods keep drawing until the scheduler replaces them
+        self.stale_lods = set(self.lods)
+        self.lod_generation += 1
+
+    def load(self):
+        self.world.resident_count += not self.resident
+        self.resident = True
+        if self.world.rebuild_budget:
+            self.world.schedule_rebuild(self)
+        else:
+            self.remesh()
+        self.rebuild_decor()
+
+    def unload(self):
+        # drops everything on the GPU, a pending worker mesh is dropped through the generation check
+        self.world.resident_count -= self.resident
+        self.resident = False
+        self.mesh_generation += 1
+        self.world.dirty_chunks.discard(self)
         self.release()
+        self.release_lods()
+        for group in self.decor_vaos.values():
+            group.release()
+        self.decor_vaos = {}
+        self.account_gpu_bytes()
+
+    def discard(self):
+        # for a chunk replaced by another with the same id, also lets go of its voxels (they may map a region file)
+        self.unload()
+        self._voxels = None
+        self.voxel_loader = None
+        self.region_file = None
+        self.world.expanded_chunks.discard(self)
+        for mirror in (self.world.shared_voxels, self.world.far_field):
+            if mirror:
+                mirror.dirty.discard(self)
 
-        content = []
-        
-        for block in self.blocks.values():
-            content += block.buffer
-        
-        self.buffer_from_content(content)
+    def combine(self):
+        self.remesh()
 
-    def buffer_from_content(self, content):
-        ctx = self.e['MGL'].ctx
-        if len(content):
-            self.buffer = ctx.buffer(data=array('f', content))
-            vao = ctx.vertex_array(self.program, [(self.buffer, '3f 2f 3f', 'vert', 'uv', 'normal')])
+    def update_bounds(self):
+        bounds = [b for b in (self.block_bounds, self.decor_bounds) if b]
+        if bounds:
+            self.bounds = (tuple(min(b[0][i] for b in bounds) for i in range(3)), tuple(max(b[1][i] for b in bounds) for i in range(3)))
+        else:
+            self.bounds = None
+
+    def update_block_bounds(self):
+        self.block_bounds = None
+        if self.block_count:
+            solid = np.argwhere(self.voxels)
+            self.block_bounds = (
+                tuple((self.world_offset[i] + int(solid[:, i].min())) * BLOCK_SCALE for i in range(3)),
+                tuple((self.world_offset[i] + int(solid[:, i].max()) + 1) * BLOCK_SCALE for i in range(3)),
+            )
+        self.update_bounds()
+
+    def expand_block_bounds(self, chunk_pos):
+        # edits that skip a remesh only grow the bounds, which keeps culling conservative
+        cell_min = tuple((self.world_offset[i] + chunk_pos[i]) * BLOCK_SCALE for i in range(3))
+        cell_max = tuple(v + BLOCK_SCALE for v in cell_min)
+        if self.block_bounds:
+            cell_min = tuple(min(cell_min[i], self.block_bounds[0][i]) for i in range(3))
+            cell_max = tuple(max(cell_max[i], self.block_bounds[1][i]) for i in range(3))
+        self.block_bounds = (cell_min, cell_max)
+        self.update_bounds()
+
+    def remesh(self):
+        self.mesh_generation += 1
+        self.update_block_bounds()
+
+        if self.world.occlusion_culling:
+            self.visibility = face_connectivity(self.voxels)
+
+        if not self.resident:
+            return
+
+        self.invalidate_lods()
+
+        if self.world.buffer_mode == 'slots':
+            self.build_slots()
+            return
+
+        if self.world.gpu_mesher:
+            self.release()
+            self.buffer, self.tvaos, self.vertex_count, self.arena_start = self.gpu_mesh(*self.mesh_snapshot())
+            self.account_gpu_bytes()
+        elif self.world.mesh_pool and (self.world.mesher != 'reference'):
+            # the old buffers keep rendering until the worker's mesh is uploaded
+            self.world.submit_mesh(self)
+        else:
+            self.release()
+            self.buffer_from_content(self.mesh())
+
+    def mesh_snapshot(self):
+        # copies of everything the mesher reads so it can run off the main thread
+        return self.block_rows, self.solid_halo()
+
+    def mesh(self):
+        if self.world.mesher == 'reference':
+            # per-block path kept as a reference for the vectorized mesher
+            content = []
+            for block in self.iter_blocks():
+                content += block.buffer
+            return np.array(content, dtype=np.float32).reshape(-1, 8)
 
-            self.tvaos = TexturedVAOs(self.program, [vao])
+        return self.world.mesher_function(*self.mesh_snapshot(), **self.world.mesh_options)
 
-            self.tvaos.bind_texture(CACHE['texture'], 'texture')
+    def buffer_from_content(self, content):
+        if len(content) and self.world.arena:
+            self.arena_start = self.world.arena.allocate(content)
+            self.vertex_count = len(content)
+        elif len(content):
+            self.buffer = self.e['MGL'].ctx.buffer(data=content)
+            self.create_vao(len(content))
         else:
             self.buffer = None
             self.tvaos = None
+        self.account_gpu_bytes()
+
+    def gpu_mesh(self, block_rows, solid_halo):
+        # one dispatch, then a GPU side copy into a buffer (or arena range) of the exact size
+        # returns (buffer, TexturedVAOs, vertex count, arena start) like the entries of lods
+        mesher = self.world.gpu_mesher
+        vertex_count = mesher.mesh(block_rows, solid_halo)
+        if not vertex_count:
+            return (None, None, 0, None)
+        if self.world.arena:
+            return (None, None, vertex_count, self.world.arena.allocate_from(mesher.vertex_buffer, vertex_count))
+        buffer = self.e['MGL'].ctx.buffer(reserve=vertex_count * mesher.vertex_bytes)
+        mesher.copy_to(buffer, vertex_count)
+        return (buffer, self.vao_for(buffer, vertex_count), vertex_count, None)
+
+    def vao_for(self, buffer, vertex_count):
+        ctx = self.e['MGL'].ctx
+        if self.world.indexed:
+            vao = ctx.vertex_array(self.program, [(buffer, *self.world.chunk_format)], index_buffer=self.world.index_buffer, index_element_size=4)
+        else:
+            vao = ctx.vertex_array(self.program, [(buffer, *self.world.chunk_format)])
+        tvaos = TexturedVAOs(self.program, [vao])
+        tvaos.bind_texture(CACHE['texture'], 'texture')
+        tvaos.vaos[0].vertices = self.draw_count(vertex_count)
+        return tvaos
+
+    def draw_count(self, vertex_count):
+        if self.world.indexed:
+            return vertex_count // len(QUAD_CORNERS) * len(QUAD_TRIANGLES)
+        return vertex_count
+
+    def create_vao(self, vertex_count):
+        self.tvaos = self.vao_for(self.buffer, vertex_count)
+        self.vertex_count = vertex_count
+
+    def set_vertex_count(self, vertex_count):
+        self.vertex_count = vertex_count
+        self.tvaos.vaos[0].vertices = self.draw_count(vertex_count)
+
+    def drawn_lod(self, factor):
+        # factor of the mesh to draw when factor is wanted (1 is the full mesh)
+        # missing and stale lods are queued with the world's rebuild scheduler instead of being built here,
+        # meanwhile the closest lod already built (or the full mesh) stands in
+        if factor == 1:
+            return 1
+        if ((factor not in self.lods) or (factor in self.stale_lods)) and (factor not in self.queued_lods):
+            self.queued_lods.add(factor)
+            self.world.schedule_lod(self, factor)
+        if not self.lods:
+            return 1
+        return min(self.lods, key=lambda lod: (abs(lod - factor), lod))
+
+    def build_lod(self, factor):
+        # run by World.process_rebuilds(), meshing on a worker when the world has a pool
+        if not self.resident:
+            self.queued_lods.discard(factor)
+            return
+        rows = downsample_rows(self.block_rows, factor)
+        if self.world.gpu_mesher:
+            self.set_lod(factor, self.gpu_mesh(rows, lod_halo(rows)))
+        elif self.world.mesh_pool:
+            self.world.submit_mesh(self, lod=factor, snapshot=(rows, lod_halo(rows)))
+        else:
+            self.upload_lod(factor, self.world.mesher_function(rows, lod_halo(rows), **self.world.mesh_options))
+
+    def upload_lod(self, factor, content):
+        if len(content) and self.world.arena:
+            self.set_lod(factor, (None, None, len(content), self.world.arena.allocate(content)))
+        elif len(content):
+            buffer = self.e['MGL'].ctx.buffer(data=content)
+            self.set_lod(factor, (buffer, self.vao_for(buffer, len(content)), len(content), None))
+        else:
+            self.set_lod(factor, (None, None, 0, None))
+
+    def set_lod(self, factor, lod):
+        self.release_lod(factor)
+        self.lods[factor] = lod
+        self.stale_lods.discard(factor)
+        self.queued_lods.discard(factor)
+        self.account_gpu_bytes()
+
+        # lod vertices are in units of factor blocks
+        transform = Transform3D()
+        transform.pos = self.transform.pos
+        transform.scale = [BLOCK_SCALE * factor] * 3
+        self.lod_transforms[factor] = transform.matrix
+
+    @property
+    def slot_vertex_count(self):
+        return 6 * (len(QUAD_CORNERS) if self.world.indexed else len(QUAD_TRIANGLES))
+
+    @property
+    def slot_bytes(self):
+        return self.slot_vertex_count * CHUNK_VERTEX_BYTES[self.world.vertex_format]
+
+    def slot_data(self, chunk_positions, flags):
+        return slot_vertices(chunk_positions, self.row_lut[self.voxels[tuple(chunk_positions.T)]], flags, vertex_format=self.world.vertex_format, tile_count=self.world.tile_count, indexed=self.world.indexed)
+
+    def build_slots(self, capacity=0):
+        # full upload of the slot buffer (greedy merging does not apply since each slot is a single block)
+        # buried blocks get no slot until an edit exposes one of their faces
+        self.release()
+
+        solid = np.argwhere(self.voxels)
+        flags = exposed_faces(self.solid_halo())[tuple(solid.T)]
+        exposed = flags.any(axis=1)
+        solid = solid[exposed]
+        flags = flags[exposed]
+
+        self.slots = np.full(self.voxels.shape, -1, dtype=np.int32)
+        self.slots[tuple(solid.T)] = np.arange(len(solid))
+        self.slot_count = len(solid)
+        self.free_slots = []
+        self.slot_capacity = min(CHUNK_SIZE ** 3, max(capacity, MIN_SLOTS, int(self.slot_count * SLOT_HEADROOM)))
+
+        self.buffer = self.e['MGL'].ctx.buffer(reserve=self.slot_capacity * self.slot_bytes)
+        if self.slot_count:
+            self.buffer.write(self.slot_data(solid, flags))
+        self.create_vao(self.slot_count * self.slot_vertex_count)
+        self.account_gpu_bytes()
+
+    def update_slots(self, chunk_positions):
+        # rewrites only the slots of blocks touched by an edit (the edited block and its neighbors)
+        if self.slots is None:
+            self.update_block_bounds()
+            self.build_slots()
+            return
+
+        # removed and fully covered blocks give their slots back, exposed blocks without one get a slot
+        solid = []
+        for chunk_pos in chunk_positions:
+            if self.voxels[chunk_pos]:
+                solid.append(chunk_pos)
+            elif self.slots[chunk_pos] >= 0:
+                self.free_slot(chunk_pos)
+        if not solid:
+            return
+
+        neighbors = np.array(solid)[:, None, :] + np.array(N6_OFFSETS) + np.array(self.world_offset)
+        flags = ~self.world.solid_mask(neighbors)
+        written = []
+        for i, chunk_pos in enumerate(solid):
+            slot = self.slots[chunk_pos]
+            if not flags[i].any():
+                if slot >= 0:
+                    self.free_slot(chunk_pos)
+                continue
+            if slot < 0:
+                if self.free_slots:
+                    slot = self.free_slots.pop()
+                elif self.slot_count < self.slot_capacity:
+                    slot = self.slot_count
+                    self.slot_count += 1
+                    self.set_vertex_count(self.slot_count * self.slot_vertex_count)
+                else:
+                    self.update_block_bounds()
+                    self.build_slots(capacity=self.slot_capacity * 2)
+                    return
+                self.slots[chunk_pos] = slot
+                self.expand_block_bounds(chunk_pos)
+            written.append((i, int(slot)))
+
+        if written:
+            indices = [i for i, slot in written]
+            data = self.slot_data(np.array(solid)[indices], flags[indices]).reshape(len(written), -1)
+            for row, (i, slot) in enumerate(written):
+                self.buffer.write(data[row], offset=slot * self.slot_bytes)
+
+    def free_slot(self, chunk_pos):
+        slot = int(self.slots[chunk_pos])
+        self.slots[chunk_pos] = -1
+        self.free_slots.append(slot)
+        self.buffer.write(bytes(self.slot_bytes), offset=slot * self.slot_bytes)
 
     def rebuild_decor(self):
         # free up old buffers
@@ -77,80 +576,184 @@ class Chunk(Element):
             group.release()
 
         self.decor_vaos = {}
+        if not self.resident:
+            return
+
         for group in self.decor:
             if len(self.decor[group]):
-                self.decor_vaos[group] = DecorGroup(self.decor[group])
+                self.decor_vaos[group] = DecorGroup(self.decor[group], cache=self.world.mesh_cache)
+
+        self.account_gpu_bytes()
+
+        group_bounds = [group.bounds for group in self.decor_vaos.values() if group.bounds]
+        self.decor_bounds = None
+        if group_bounds:
+            self.decor_bounds = (tuple(min(b[0][i] for b in group_bounds) for i in range(3)), tuple(max(b[1][i] for b in group_bounds) for i in range(3)))
+        self.update_bounds()
+
+    def border_neighbors(self, world_pos):
+        # faces of blocks on the border of a neighboring chunk may have been exposed or covered by an edit here
+        neighbors = []
+        chunk_pos = self.local_pos(world_pos)
+        for axis in range(3):
+            for direction in (-1, 1):
+                if chunk_pos[axis] == (CHUNK_SIZE - 1 if direction == 1 else 0):
+                    neighbor = self.neighbor(axis, direction)
+                    if neighbor:
+                        neighbors.append(neighbor)
+        return neighbors
 
     def rebuild(self, deltas_only=False, local=False):
-        # release any old data that's about to be replaced
-        self.release()
-
-        content = []
-
-        if not deltas_only:
-            for block in self.blocks.values():
-                block.generate()
-                content += block.buffer
-        else:
-            built_blocks = set()
+        if deltas_only:
             for pos in self.changes_since_rebuild:
-                for offset in N7_OFFSETS:
-                    world_pos = tuple(offset[i] + v for i, v in enumerate(pos))
-                    if world_pos not in built_blocks:
-                        built_blocks.add(world_pos)
-                    else:
-                        continue
-                    block = self.world.get_block(world_pos)
-                    if block:
-                        block.generate()
-                        if block.chunk != self:
-                            self.world.temp_rebuild['combines_needed'].add(block.chunk)
-            
-            for block in self.blocks.values():
-                content += block.buffer
+                self.world.temp_rebuild['combines_needed'].update(self.border_neighbors(pos))
         
         self.changes_since_rebuild = set()
         self.world.temp_rebuild['rebuilt'].add(self)
 
-        self.buffer_from_content(content)
+        self.remesh()
 
         if local and deltas_only:
             self.world.combine_missing()
 
     def get_block(self, world_pos):
-        if world_pos in self.blocks:
-            return self.blocks[world_pos]
+        chunk_pos = (world_pos[0] - self.world_offset[0], world_pos[1] - self.world_offset[1], world_pos[2] - self.world_offset[2])
+        value = self.voxels[chunk_pos]
+        if value:
+            return ChunkBlock(self, block_id=self.palette[value], chunk_pos=chunk_pos)
 
     def add_block(self, block_id, world_pos, rebuild=True):
-        chunk_pos = tuple(world_pos[i] - self.world_offset[i] for i in range(3))
+        chunk_pos = self.local_pos(world_pos)
 
-        self.blocks[world_pos] = ChunkBlock(self, block_id=block_id, chunk_pos=chunk_pos)
+        if not self.voxels[chunk_pos]:
+            self.block_count += 1
+        value = self.palette_index(block_id)
+        self.writable_voxels()[chunk_pos] = value
+        self.world.occupancy.set(self, chunk_pos, True)
+        self.world.voxels_changed(self)
 
-        self.changes_since_rebuild.add(world_pos)
-
-        if rebuild:
-            self.rebuild(deltas_only=True, local=True)
+        self.edited(world_pos, rebuild)
 
     def remove_block(self, world_pos, rebuild=True):
-        if world_pos in self.blocks:
-            del self.blocks[world_pos]
+        chunk_pos = self.local_pos(world_pos)
+        if self.voxels[chunk_pos]:
+            self.writable_voxels()[chunk_pos] = 0
+            self.world.occupancy.set(self, chunk_pos, False)
+            self.world.voxels_changed(self)
+            self.block_count -= 1
+
+            self.edited(world_pos, rebuild)
+
+    def fill_rows(self, local_slice, rows):
+        # rows holds BLOCK_MAP ids for the sliced part of the chunk, -1 leaves the existing voxel alone
+        lut = np.zeros(len(BLOCK_IDS), dtype=np.int64)
+        for row in np.unique(rows[rows >= 0]):
+            lut[row] = self.palette_index(BLOCK_IDS[row])
+
+        voxels = self.writable_voxels()
+        voxels[local_slice] = np.where(rows >= 0, lut[np.maximum(rows, 0)], voxels[local_slice])
+        self.block_count = int(np.count_nonzero(voxels))
+        self.visibility = None
+        self.world.occupancy.invalidate(self)
+        self.world.voxels_changed(self)
+
+    def edited(self, world_pos, rebuild):
+        # recomputed on the next rebuild, or lazily by the occlusion search for edits that skip one
+        self.visibility = None
+        self.invalidate_lods()
+
+        if rebuild and (self.world.buffer_mode == 'slots'):
+            self.world.update_slots(world_pos)
+            return
+
+        if rebuild and self.world.rebuild_budget:
+            self.world.schedule_rebuild(self, *self.border_neighbors(world_pos))
+            return
 
-            self.changes_since_rebuild.add(world_pos)
+        self.changes_since_rebuild.add(world_pos)
 
-            if rebuild:
-                self.rebuild(deltas_only=True, local=True)
+        if rebuild:
+            self.rebuild(deltas_only=True, local=True)
 
-    def render(self, camera, uniforms={}, decor_uniforms={}):
-        if self.tvaos:
+    def render(self, camera, uniforms={}, decor_uniforms={}, lod=1):
+        # returns the number of draw calls made and the number of vertices they drew
+        self.last_rendered = self.world.frame_index
+        draw_calls = len(self.decor_vaos)
+
+        tvaos = self.tvaos
+        world_transform = self.transform.matrix
+        vertex_count = self.vertex_count
+        lod = self.drawn_lod(lod) if tvaos else 1
+        if lod > 1:
+            buffer, tvaos, vertex_count, arena_start = self.lods[lod]
+            world_transform = self.lod_transforms[lod]
+
+        if tvaos:
+            draw_calls += 1
             uniforms['world_light_pos'] = tuple(camera.light_pos)
-            uniforms['world_transform'] = self.transform.matrix
+            uniforms['world_transform'] = world_transform
             uniforms['view_projection'] = camera.prepped_matrix
             uniforms['eye_pos'] = camera.eye_pos
-            self.tvaos.render(uniforms=uniforms)
-        
+            uniforms['tile_size'] = self.world.tile_size
+            tvaos.render(uniforms=uniforms)
+        else:
+            vertex_count = 0
+
+        self.render_decor(camera, decor_uniforms)
+
+        return draw_calls, vertex_count
+
+    def render_depth(self, camera, uniforms={}, lod=1):
+        # depth only draw of the same mesh render() would draw, returns the number of draw calls made
+        tvaos = self.tvaos
+        buffer = self.buffer
+        world_transform = self.transform.matrix
+        lod = self.drawn_lod(lod) if tvaos else 1
+        if lod > 1:
+            buffer, tvaos, vertex_count, arena_start = self.lods[lod]
+            world_transform = self.lod_transforms[lod]
+        if not tvaos:
+            return 0
+
+        if (lod not in self.depth_vaos) or (self.depth_vaos[lod][0] is not buffer):
+            if lod in self.depth_vaos:
+                self.depth_vaos[lod][1].vaos[0].release()
+            ctx = self.e['MGL'].ctx
+            program = self.world.depth_program
+            layout = used_layout(program, self.world.chunk_format)
+            if self.world.indexed:
+                vao = ctx.vertex_array(program, [(buffer, *layout)], index_buffer=self.world.index_buffer, index_element_size=4)
+            else:
+                vao = ctx.vertex_array(program, [(buffer, *layout)])
+            self.depth_vaos[lod] = (buffer, VAOs(program, [vao]))
+
+        vaos = self.depth_vaos[lod][1]
+        # slot buffers change their vertex count without a new buffer
+        vaos.vaos[0].vertices = tvaos.vaos[0].vertices
+        uniforms['world_transform'] = world_transform
+        uniforms['view_projection'] = camera.prepped_matrix
+        vaos.render(uniforms=uniforms)
+        return 1
+
+    def arena_draw(self, lod=1):
+        # (first vertex, vertex count, (x, y, z, scale)) for ChunkArena.render(), None when there's nothing to draw
+        self.last_rendered = self.world.frame_index
+        if self.arena_start is None:
+            return None
+
+        lod = self.drawn_lod(lod)
+        if lod > 1:
+            buffer, tvaos, vertex_count, arena_start = self.lods[lod]
+            if arena_start is None:
+                return None
+            return (arena_start, vertex_count, (*self.transform.pos, BLOCK_SCALE * lod))
+        return (self.arena_start, self.vertex_count, (*self.transform.pos, BLOCK_SCALE))
+
+    def render_decor(self, camera, decor_uniforms={}):
         decor_uniforms['world_light_pos'] = tuple(camera.light_pos)
         decor_uniforms['world_transform'] = self.transform.matrix
         decor_uniforms['view_projection'] = camera.prepped_matrix
         decor_uniforms['eye_pos'] = camera.eye_pos
         for group in self.decor_vaos:
             self.decor_vaos[group].vao.render(uniforms=decor_uniforms)
+        return len(self.decor_vaos)
@@ -1,8 +1,53 @@
 CHUNK_SIZE = 16
 BLOCK_SCALE = 0.75
 
+# every face of every block in a chunk
+MAX_CHUNK_QUADS = CHUNK_SIZE ** 3 * 6
+
+# ms per frame spent on queued rebuilds (broken blocks and lod meshes) in worlds without a rebuild_budget
+DEFAULT_REBUILD_BUDGET = 2.0
+
 BASE_DECOR_FORMAT = ['uv', 'normal', 'vert']
 DECOR_FORMAT = ['2f 3f 3f 3f', 'uv', 'normal', 'vert', 'origin']
 
+# vertex layouts for chunk meshes
+# 'float' uses atlas uvs with the world's program, 'tiled' repeats the atlas tile for merged faces
+# and 'packed' stores chunk position, face and block id in a single uint32
+CHUNK_FORMATS = {
+    'float': ['3f 2f 3f', 'vert', 'uv', 'normal'],
+    'tiled': ['3f 2f 3f 2f', 'vert', 'uv', 'normal', 'tile'],
+    'packed': ['1u4', 'data'],
+}
+CHUNK_VERTEX_BYTES = {
+    'float': 32,
+    'tiled': 40,
+    'packed': 4,
+}
+CHUNK_SHADERS = {
+    'tiled': ('data/shaders/chunk_tiled.vert', 'data/shaders/chunk.frag'),
+    'packed': ('data/shaders/chunk_packed.vert', 'data/shaders/chunk.frag'),
+}
+
+# 'arena' buffer mode variants that take the chunk offset from a per-draw instance attribute
+CHUNK_ARENA_SHADERS = {
+    'float': ('data/shaders/chunk_arena.vert', 'data/shaders/default.frag'),
+    'tiled': ('data/shaders/chunk_tiled_arena.vert', 'data/shaders/chunk.frag'),
+    'packed': ('data/shaders/chunk_packed_arena.vert', 'data/shaders/chunk.frag'),
+}
+
+# vertex shaders the depth pre-pass pairs with depth_only.frag (the same transforms as the shading pass)
+CHUNK_DEPTH_SHADERS = {
+    'float': 'data/shaders/default.vert',
+    'tiled': 'data/shaders/chunk_tiled.vert',
+    'packed': 'data/shaders/chunk_packed.vert',
+}
+DEPTH_FRAGMENT_SHADER = 'data/shaders/depth_only.frag'
+
+# compute shader of the 'gpu' mesher, it writes 'packed' vertices
+CHUNK_MESH_SHADER = 'data/shaders/chunk_mesh.comp'
+
+# full screen raymarch of the brickmap beyond the near field
+FAR_FIELD_SHADERS = ('data/shaders/far_field.vert', 'data/shaders/far_field.frag')
+
 class MaxDepthReached(Exception):
     pass
\ No newline at end of file
@@ -1,29 +1,56 @@
 from array import array
 
 import glm
+import numpy as np
 
 from ..elements import Element
 from ..model.vao import TexturedVAOs
 from .const import BASE_DECOR_FORMAT, DECOR_FORMAT
 
+# floats per decor vertex and the offset of the position ('2f 3f 3f 3f' as uv, normal, vert, origin)
+DECOR_FLOATS = 11
+DECOR_VERT_OFFSET = 5
+
+# per-model '2f 3f 3f' source vertices (uv, normal, vert) keyed by model name
+DECOR_TEMPLATES = {}
+
+def decor_template(source):
+    if source.name not in DECOR_TEMPLATES:
+        vertices = []
+        for material in source.geometry.materials:
+            for vertex in source.geometry.materials[material]:
+                vertices.append([v for group in BASE_DECOR_FORMAT for v in vertex[group]])
+        DECOR_TEMPLATES[source.name] = np.array(vertices, dtype=np.float64).reshape(-1, 8)
+    return DECOR_TEMPLATES[source.name]
+
 class DecorGroup(Element):
-    def __init__(self, items):
+    def __init__(self, items, cache=None):
         super().__init__()
 
         self.items = items
 
         self.mgl_buffer = None
+        self.vao = None
+        self.bounds = None
 
         if len(self.items):
             self.program = self.items[0].source.vao.program
 
-            self.buffer = array('f', [])
-
-            for item in self.items:
-                self.buffer += item.buffer
+            # a MeshCache hit skips building the items' vertices entirely
+            if cache:
+                self.buffer = cache.decor(self.items)
+            else:
+                self.buffer = array('f', [])
+                for item in self.items:
+                    self.buffer += item.buffer
 
             self.mgl_buffer = self.e['MGL'].ctx.buffer(data=self.buffer)
 
+            # decor vertices are already in world space
+            if len(self.buffer):
+                verts = np.frombuffer(self.buffer, dtype=np.float32).reshape(-1, DECOR_FLOATS)[:, DECOR_VERT_OFFSET:DECOR_VERT_OFFSET + 3]
+                self.bounds = (tuple(float(v) for v in verts.min(axis=0)), tuple(float(v) for v in verts.max(axis=0)))
+
             vao = self.e['MGL'].ctx.vertex_array(self.program, [(self.mgl_buffer, *DECOR_FORMAT)])
 
             self.vao = TexturedVAOs(self.program, [vao])
@@ -33,6 +60,10 @@ class DecorGroup(Element):
             self.texture_flags = items[0].source.vao.texture_flags
 
     def release(self):
+        if self.vao:
+            for vao in self.vao.vaos:
+                vao.release()
+            self.vao = None
         if self.mgl_buffer:
             self.mgl_buffer.release()
             self.mgl_buffer = None
@@ -47,26 +78,30 @@ class Decor(Element):
         self.rot = glm.quat(rot)
         self.scale = glm.vec3(scale)
 
-        self.generate_buffer()
+        # vertices are built on first use (a cached DecorGroup never needs them)
+        self._buffer = None
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            self.generate_buffer()
+        return self._buffer
 
     def generate_buffer(self):
         self.transform = glm.translate(self.pos) * glm.mat4(self.rot) * glm.scale(self.scale)
         self.normal_transform = glm.transpose(glm.inverse(self.transform))
 
-        buffer = []
-
-        for material in self.source.geometry.materials:
-            if len(self.source.geometry.materials[material]):
-                for vertex in self.source.geometry.materials[material]:
-                    for group in BASE_DECOR_FORMAT:
-                        item = vertex[group]
-                        if group == 'vert':
-                            item = tuple(self.transform * glm.vec3(item))
-                        if group == 'normal':
-                            item = tuple(glm.normalize(self.normal_transform * glm.vec4(glm.vec3(item), 0.0)).xyz)
-                        for v in item:
-                            buffer.append(v)
-                    for v in self.pos:
-                        buffer.append(v)
-        
-        self.buffer = array('f', buffer)
+        template = decor_template(self.source)
+        transform = np.array(self.transform, dtype=np.float64)
+        normal_transform = np.array(self.normal_transform, dtype=np.float64)
+
+        vertices = np.empty((len(template), DECOR_FLOATS), dtype=np.float32)
+        vertices[:, 0:2] = template[:, 0:2]
+        # normalized as a vec4 (w picks up the translation) to match the original per-vertex glm path
+        normals = template[:, 2:5] @ normal_transform[:, :3].T
+        vertices[:, 2:5] = (normals / np.linalg.norm(normals, axis=1)[:, None])[:, :3]
+        vertices[:, DECOR_VERT_OFFSET:DECOR_VERT_OFFSET + 3] = template[:, 5:8] @ transform[:3, :3].T + transform[:3, 3]
+        vertices[:, DECOR_VERT_OFFSET + 3:] = tuple(self.pos)
+
+        self._buffer = array('f')
+        self._buffer.frombytes(vertices.tobytes())
@@ -0,0 +1,127 @@
+import numpy as np
+
+from ..elements import Element
+from ..model.vao import VAOs
+from .block import CACHE
+from .mesher import downsample_rows
+from .const import CHUNK_SIZE, BLOCK_SCALE, FAR_FIELD_SHADERS
+
+# cells per side of the groups in each brick's occupancy mask
+GROUP_SIZE = 4
+
+# bricks reserved up front (grows by doubling)
+FAR_FIELD_START_BRICKS = 256
+
+# ray steps before a pixel gives up (steps skip whole empty chunks and empty groups)
+FAR_FIELD_MAX_STEPS = 512
+
+class FarField(Element):
+    def __init__(self, world, distance, factor=1):
+        # brickmap of every chunk raymarched in a full screen pass, drawing the chunks that the near field skips
+        # (those with their center further than distance from the eye) so its cost scales with pixels instead of chunks
+        # each chunk is one brick of (CHUNK_SIZE / factor)^3 cells holding BLOCK_MAP id + 1 and a 64 bit mask of
+        # which 4x4x4 groups of cells hold anything, and a dense grid over the chunk ids holds brick index + 1
+        # factor downsamples the bricks like lod meshes (1, 2 or 4)
+        super().__init__()
+
+        self.world = world
+        self.distance = distance
+        self.factor = factor
+        self.brick_size = CHUNK_SIZE // factor
+        self.brick_bytes = self.brick_size ** 3
+        self.ctx = self.e['MGL'].ctx
+        self.program = self.e['MGL'].program(*FAR_FIELD_SHADERS)
+        # one triangle covering the screen with its corners made from gl_VertexID
+        self.vaos = VAOs(self.program, [self.ctx.vertex_array(self.program, [])])
+        self.vaos.vaos[0].vertices = 3
+
+        self.bricks = {}
+        self.dirty = set(world.chunks.values())
+
+        self.capacity = FAR_FIELD_START_BRICKS
+        self.brick_buffer = self.ctx.buffer(reserve=self.capacity * self.brick_bytes)
+        self.mask_buffer = self.ctx.buffer(reserve=self.capacity * 8)
+
+        self.grid_min = (0, 0, 0)
+        self.grid = np.zeros((1, 1, 1), dtype=np.uint32)
+        self.grid_buffer = self.ctx.buffer(data=self.grid)
+
+    def grow(self, brick_count):
+        capacity = self.capacity
+        while capacity < brick_count:
+            capacity *= 2
+
+        for name, item_bytes in (('brick_buffer', self.brick_bytes), ('mask_buffer', 8)):
+            buffer = self.ctx.buffer(reserve=capacity * item_bytes)
+            self.ctx.copy_buffer(buffer, getattr(self, name))
+            getattr(self, name).release()
+            setattr(self, name, buffer)
+        self.capacity = capacity
+
+    def rebuild_grid(self):
+        ids = np.array(list(self.bricks), dtype=np.int64).reshape(-1, 3)
+        self.grid_min = tuple(int(v) for v in ids.min(axis=0))
+        self.grid = np.zeros(tuple(int(v) for v in ids.max(axis=0) - ids.min(axis=0) + 1), dtype=np.uint32)
+        for chunk_id, brick in self.bricks.items():
+            self.grid[tuple(chunk_id[i] - self.grid_min[i] for i in range(3))] = brick + 1
+        self.grid_buffer.release()
+        self.grid_buffer = self.ctx.buffer(data=self.grid)
+
+    def sync(self):
+        # uploads the bricks of every chunk changed since the last sync, returns the number written
+        # empty chunks get no brick until they hold a block
+        chunks = [chunk for chunk in self.dirty if chunk.block_count or (chunk.chunk_id in self.bricks)]
+        self.dirty = set()
+        new_chunks = [chunk for chunk in chunks if chunk.chunk_id not in self.bricks]
+        if len(self.bricks) + len(new_chunks) > self.capacity:
+            self.grow(len(self.bricks) + len(new_chunks))
+        for chunk in new_chunks:
+            self.bricks[chunk.chunk_id] = len(self.bricks)
+        if new_chunks:
+            self.rebuild_grid()
+
+        for chunk in chunks:
+            rows = chunk.block_rows
+            if self.factor > 1:
+                rows = downsample_rows(rows, self.factor)
+            cells = (rows + 1).astype(np.uint8)
+            groups = self.brick_size // GROUP_SIZE
+            occupied = (cells != 0).reshape(groups, GROUP_SIZE, groups, GROUP_SIZE, groups, GROUP_SIZE).any(axis=(1, 3, 5))
+            mask = np.zeros(8, dtype=np.uint8)
+            mask[:(occupied.size + 7) // 8] = np.packbits(occupied.reshape(-1), bitorder='little')
+
+            brick = self.bricks[chunk.chunk_id]
+            self.brick_buffer.write(cells.tobytes(), offset=brick * self.brick_bytes)
+            self.mask_buffer.write(mask.tobytes(), offset=brick * 8)
+        return len(chunks)
+
+    @property
+    def memory_usage(self):
+        return self.brick_buffer.size + self.mask_buffer.size + self.grid_buffer.size
+
+    def render(self, camera, uniforms={}):
+        self.sync()
+        if not self.bricks:
+            return 0
+
+        # prepped matrices are column major
+        view_projection = np.array(camera.prepped_matrix, dtype=np.float64).reshape(4, 4).T
+        uniforms['inverse_view_projection'] = tuple(np.linalg.inv(view_projection).T.reshape(-1))
+        uniforms['view_projection'] = camera.prepped_matrix
+        uniforms['world_light_pos'] = tuple(camera.light_pos)
+        uniforms['eye_pos'] = tuple(camera.eye_pos)
+        uniforms['tile_size'] = self.world.tile_size
+        uniforms['tex'] = CACHE['texture']
+        uniforms['grid_min'] = self.grid_min
+        uniforms['grid_size'] = self.grid.shape
+        uniforms['brick_size'] = self.brick_size
+        uniforms['cell_scale'] = BLOCK_SCALE * self.factor
+        uniforms['chunk_scale'] = BLOCK_SCALE * CHUNK_SIZE
+        uniforms['near_distance'] = self.distance
+        uniforms['max_steps'] = FAR_FIELD_MAX_STEPS
+
+        self.grid_buffer.bind_to_storage_buffer(0)
+        self.brick_buffer.bind_to_storage_buffer(1)
+        self.mask_buffer.bind_to_storage_buffer(2)
+        self.vaos.render(uniforms=uniforms)
+        return 1
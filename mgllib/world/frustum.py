@@ -0,0 +1,32 @@
+import numpy as np
+
+class Frustum:
+    def __init__(self, matrix, margin=0.0):
+        # matrix is a flattened column-major view projection (the layout passed to shaders)
+        m = np.array(matrix, dtype=np.float64).reshape(4, 4).T
+
+        # left, right, bottom, top, near, far
+        planes = np.array([
+            m[3] + m[0],
+            m[3] - m[0],
+            m[3] + m[1],
+            m[3] - m[1],
+            m[3] + m[2],
+            m[3] - m[2],
+        ])
+        planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+        # pushing every plane outwards keeps anything within margin of the frustum
+        planes[:, 3] += margin
+
+        self.planes = planes
+
+    def test_aabbs(self, mins, maxs):
+        # an AABB is outside if its corner furthest along a plane's normal is behind that plane
+        normals = self.planes[:, :3]
+        corners = np.where(normals[None, :, :] >= 0, maxs[:, None, :], mins[:, None, :])
+        distances = np.einsum('npk,pk->np', corners, normals) + self.planes[:, 3]
+        return np.all(distances >= 0, axis=1)
+
+    def test_aabb(self, aabb_min, aabb_max):
+        return bool(self.test_aabbs(np.array([aabb_min]), np.array([aabb_max]))[0])
@@ -0,0 +1,204 @@
+import math
+import queue
+import random
+import multiprocessing
+
+import glm
+import noise
+import numpy as np
+
+from .const import CHUNK_SIZE, BLOCK_SCALE
+from .block import BLOCK_MAP
+from .chunk import Chunk
+from .decor import Decor
+
+# decor rules as (model name, placed where the column noise is above or below a roll, chance, random yaw)
+DEFAULT_DECOR_RULES = [
+    ('grass', 'above', 0.5, False),
+    ('tree', 'below', 0.03, True),
+]
+
+class TerrainSettings:
+    def __init__(self, seed=0, noise_scale=0.08, octaves=2, amplitude=5, base_height=1, floor_y=-6, noise_offset=(64, 64), bounds=None, top_id='grass', fill_id='dirt', monument_chance=0.003, monument_clearance=8, decor_rules=DEFAULT_DECOR_RULES):
+        self.seed = seed
+        self.noise_scale = noise_scale
+        self.octaves = octaves
+        self.amplitude = amplitude
+        self.base_height = base_height
+
+        # block y of the lowest layer and the offset added to block x/z before sampling noise
+        self.floor_y = floor_y
+        self.noise_offset = noise_offset
+
+        # ((min x, min z), (max x, max z)) in blocks with max exclusive, None for an unbounded world
+        self.bounds = bounds
+
+        self.top_id = top_id
+        self.fill_id = fill_id
+        self.monument_chance = monument_chance
+        self.monument_clearance = monument_clearance
+        self.decor_rules = decor_rules
+
+def column_noise(settings, x, z):
+    return noise.pnoise2((x + settings.noise_offset[0]) * settings.noise_scale, (z + settings.noise_offset[1]) * settings.noise_scale, octaves=settings.octaves) * 0.5 + 0.5
+
+def generate_column(settings, column):
+    # runs in a worker process and only returns plain data
+    # (column, {chunk id: uint8 voxels}, palette, monument sites, decor placements as (model name, pos, yaw))
+    rng = random.Random(hash((settings.seed, column[0], column[1])))
+    origin = (column[0] * CHUNK_SIZE, column[1] * CHUNK_SIZE)
+
+    heights = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.int32)
+    noise_values = np.zeros((CHUNK_SIZE, CHUNK_SIZE))
+    inside = np.ones((CHUNK_SIZE, CHUNK_SIZE), dtype=bool)
+    for x in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            world_x = origin[0] + x
+            world_z = origin[1] + z
+            if settings.bounds and not (settings.bounds[0][0] <= world_x < settings.bounds[1][0] and settings.bounds[0][1] <= world_z < settings.bounds[1][1]):
+                inside[x, z] = False
+                continue
+            noise_values[x, z] = column_noise(settings, world_x, world_z)
+            heights[x, z] = int(noise_values[x, z] * settings.amplitude + settings.base_height)
+
+    # palette indices 1 and 2 are the fill and top blocks
+    palette = [settings.fill_id, settings.top_id]
+    levels = np.arange(max(1, int(heights.max())))[None, :, None]
+    columns = heights[:, None, :]
+    volume = np.where(levels < columns - 1, 1, np.where(levels == columns - 1, 2, 0)).astype(np.uint8)
+
+    chunks = {}
+    for y in range(settings.floor_y // CHUNK_SIZE, (settings.floor_y + volume.shape[1] - 1) // CHUNK_SIZE + 1):
+        voxels = np.zeros((CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+        lo = max(settings.floor_y, y * CHUNK_SIZE)
+        hi = min(settings.floor_y + volume.shape[1], (y + 1) * CHUNK_SIZE)
+        voxels[:, lo - y * CHUNK_SIZE:hi - y * CHUNK_SIZE] = volume[:, lo - settings.floor_y:hi - settings.floor_y]
+        if voxels.any():
+            chunks[(column[0], y, column[1])] = voxels
+
+    monuments = []
+    decor = []
+    for x in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            if not inside[x, z]:
+                continue
+            world_x = origin[0] + x
+            world_z = origin[1] + z
+            top_y = settings.floor_y + int(heights[x, z]) - 1
+            if (abs(world_x) + abs(world_z)) > settings.monument_clearance:
+                if rng.random() < settings.monument_chance:
+                    monuments.append((world_x, top_y + 1, world_z))
+
+            for name, where, chance, spin in settings.decor_rules:
+                roll = rng.random()
+                if (roll > noise_values[x, z]) if where == 'above' else (roll < noise_values[x, z]):
+                    if rng.random() < chance:
+                        pos = ((world_x + 0.5) * BLOCK_SCALE, (top_y + 1) * BLOCK_SCALE, (world_z + 0.5) * BLOCK_SCALE)
+                        decor.append((name, pos, rng.random() * math.pi * 2 if spin else 0.0))
+
+    return column, chunks, palette, monuments, decor
+
+class ChunkGenerator:
+    def __init__(self, world, settings, decor_sources=(), place_monument=None, processes=None, radius=None, upload_cap=4):
+        # terrain is generated one chunk column (every chunk sharing an x/z) at a time in a process pool
+        # the main process only splices voxel arrays into world.chunks and builds the decor
+        self.world = world
+        self.settings = settings
+        self.decor_sources = {source.name: source for source in decor_sources}
+        self.place_monument = place_monument
+        self.pool = multiprocessing.Pool(processes)
+
+        # with a radius (world units) update() keeps requesting columns around the player as it moves
+        # and the generator registers itself as world.generator so frame_update() calls it
+        self.radius = radius
+        self.upload_cap = upload_cap
+        self.requested = set()
+        self.finished = queue.Queue()
+        self.pending = 0
+        if radius:
+            world.generator = self
+
+    def columns_in(self, min_block, max_block):
+        return [(x, z) for x in range(min_block[0] // CHUNK_SIZE, (max_block[0] - 1) // CHUNK_SIZE + 1) for z in range(min_block[1] // CHUNK_SIZE, (max_block[1] - 1) // CHUNK_SIZE + 1)]
+
+    def generate(self, columns=None):
+        # blocking generation, used for the startup world (defaults to the whole bounded area)
+        if columns is None:
+            columns = self.columns_in(*self.settings.bounds)
+        columns = [column for column in columns if column not in self.requested]
+        self.requested.update(columns)
+        results = self.pool.starmap(generate_column, [(self.settings, column) for column in columns])
+        return self.splice(results, rebuild=False)
+
+    def request(self, columns):
+        for column in columns:
+            if column not in self.requested:
+                self.requested.add(column)
+                self.pending += 1
+                self.pool.apply_async(generate_column, (self.settings, column), callback=self.finished.put)
+
+    def update(self):
+        # called from World.frame_update()
+        if self.radius:
+            origin = self.world.focus_pos
+            reach = int(math.ceil(self.radius / (CHUNK_SIZE * BLOCK_SCALE)))
+            center = (int((origin[0] / BLOCK_SCALE) // CHUNK_SIZE), int((origin[2] / BLOCK_SCALE) // CHUNK_SIZE))
+            columns = []
+            for x in range(center[0] - reach, center[0] + reach + 1):
+                for z in range(center[1] - reach, center[1] + reach + 1):
+                    if ((x + 0.5) * CHUNK_SIZE * BLOCK_SCALE - origin[0]) ** 2 + ((z + 0.5) * CHUNK_SIZE * BLOCK_SCALE - origin[2]) ** 2 <= self.radius ** 2:
+                        columns.append((x, z))
+            if self.settings.bounds:
+                bounded = set(self.columns_in(*self.settings.bounds))
+                columns = [column for column in columns if column in bounded]
+            self.request(columns)
+
+        results = []
+        while self.pending and (len(results) < self.upload_cap):
+            try:
+                results.append(self.finished.get(block=False))
+            except queue.Empty:
+                break
+        self.pending -= len(results)
+        if results:
+            self.splice(results, rebuild=True)
+
+    def splice(self, results, rebuild=True):
+        touched = set()
+        for column, chunks, palette, monuments, decor in results:
+            for chunk_id, voxels in chunks.items():
+                if chunk_id not in self.world.chunks:
+                    self.world.chunks[chunk_id] = Chunk(self.world, chunk_id)
+                chunk = self.world.chunks[chunk_id]
+                rows = np.array([-1] + [BLOCK_MAP[block_id] for block_id in palette], dtype=np.int16)[voxels]
+                chunk.fill_rows((slice(None), slice(None), slice(None)), rows)
+                touched.add(chunk)
+
+        # monuments reach into neighboring columns, so they all go in before any decor
+        # (their edits are rebuilt along with the spliced chunks)
+        sites = [site for result in results for site in result[3]]
+        if self.place_monument and sites:
+            with self.world.edit(rebuild=False) as tx:
+                for site in sites:
+                    self.place_monument(site)
+            touched.update(tx.dirty_chunks())
+
+        decor_chunks = set()
+        for column, chunks, palette, monuments, decor in results:
+            for name, pos, yaw in decor:
+                # monuments can cover a column after its decor was rolled
+                block_pos = tuple(int(pos[i] // BLOCK_SCALE) for i in range(3))
+                if (name in self.decor_sources) and (not self.world.get_block(block_pos)):
+                    self.world.add_decor(Decor(self.decor_sources[name], pos, rot=glm.rotate(yaw, (0, 1, 0))))
+                    decor_chunks.add(self.world.chunks[tuple(int((pos[i] / BLOCK_SCALE) // CHUNK_SIZE) for i in range(3))])
+
+        if rebuild:
+            self.world.rebuild_chunks(touched)
+            for chunk in decor_chunks:
+                chunk.rebuild_decor()
+        return touched
+
+    def close(self):
+        if self.world.generator is self:
+            self.world.generator = None
+        self.pool.terminate()
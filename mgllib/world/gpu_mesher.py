@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+
+from ..elements import Element
+from .mesher import QUAD_CORNERS, QUAD_TRIANGLES
+from .const import CHUNK_SIZE, MAX_CHUNK_QUADS, CHUNK_VERTEX_BYTES, CHUNK_MESH_SHADER
+
+# invocations per axis of one work group (matches chunk_mesh.comp)
+GROUP_SIZE = 4
+
+class GPUMesher(Element):
+    def __init__(self, world):
+        # face culling in a compute shader that writes 'packed' vertices straight into a GPU buffer
+        # each visible face claims its range with an atomic counter, so the only thing read back is the count
+        super().__init__()
+
+        self.world = world
+        self.ctx = self.e['MGL'].ctx
+        self.program = self.e['MGL'].compute_shader(CHUNK_MESH_SHADER)
+        self.vertex_bytes = CHUNK_VERTEX_BYTES['packed']
+        self.quad_vertices = len(QUAD_CORNERS) if world.indexed else len(QUAD_TRIANGLES)
+
+        # sized for the worst case, finished meshes are copied out into buffers (or arena ranges) of their own
+        self.voxel_buffer = self.ctx.buffer(reserve=(CHUNK_SIZE + 2) ** 3 * 4)
+        self.vertex_buffer = self.ctx.buffer(reserve=MAX_CHUNK_QUADS * self.quad_vertices * self.vertex_bytes)
+        self.counter_buffer = self.ctx.buffer(reserve=4)
+
+    def mesh(self, block_rows, solid_halo):
+        # same inputs as mesh_chunk(), returns the vertex count with the vertices at the start of vertex_buffer
+        size = block_rows.shape[0]
+        voxels = solid_halo.astype(np.uint32)
+        voxels[1:-1, 1:-1, 1:-1] = block_rows + 1
+        self.voxel_buffer.write(voxels.tobytes())
+        self.counter_buffer.write(bytes(4))
+
+        self.voxel_buffer.bind_to_storage_buffer(0)
+        self.vertex_buffer.bind_to_storage_buffer(1)
+        self.counter_buffer.bind_to_storage_buffer(2)
+        self.program['size'] = size
+        self.program['indexed'] = self.world.indexed
+        groups = math.ceil(size / GROUP_SIZE)
+        self.program.run(groups, groups, groups)
+        self.ctx.memory_barrier()
+
+        return int(np.frombuffer(self.counter_buffer.read(), dtype=np.uint32)[0]) * self.quad_vertices
+
+    def copy_to(self, buffer, vertex_count, offset=0):
+        # offset is in vertices
+        self.ctx.copy_buffer(buffer, self.vertex_buffer, size=vertex_count * self.vertex_bytes, write_offset=offset * self.vertex_bytes)
+
+    @property
+    def memory_usage(self):
+        return self.voxel_buffer.size + self.vertex_buffer.size + self.counter_buffer.size
@@ -0,0 +1,132 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .mesher import mesh_chunk
+from .decor import decor_template
+
+# bump whenever the mesher or a vertex layout changes so stale entries stop matching
+MESH_CACHE_VERSION = b'mesh-1'
+
+# default size of the cache directory before the least recently used entries are deleted
+MESH_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+class MeshCache:
+    def __init__(self, path, max_bytes=MESH_CACHE_MAX_BYTES):
+        # finished vertex arrays stored as .npy files named by a hash of everything that produced them
+        # entries are memory mapped on load so they can be uploaded without a copy
+        # every chunk state gets its own entry, so once the directory holds more than max_bytes
+        # the least recently used entries are deleted (file modification times carry the order across runs)
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+        # key -> size in bytes, least recently used first (guarded by lock since mesh workers share the cache)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        files = [entry for entry in os.scandir(self.path) if entry.name.endswith('.npy')]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self.entries[entry.name[:-4]] = entry.stat().st_size
+            self.total_bytes += entry.stat().st_size
+
+        self.template_keys = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + '.npy')
+
+    def load(self, key):
+        entry = self.entry_path(key)
+        if not os.path.exists(entry):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touch(key, entry)
+        try:
+            return np.load(entry, mmap_mode='r')
+        except ValueError:
+            # empty arrays can't be mapped
+            return np.load(entry)
+
+    def store(self, key, content):
+        # written beside the entry and swapped in so concurrent workers never read a partial file
+        entry = self.entry_path(key)
+        temp_path = '%s.%d.tmp' % (entry, os.getpid())
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(content))
+        os.replace(temp_path, entry)
+
+        with self.lock:
+            self.total_bytes += os.path.getsize(entry) - self.entries.pop(key, 0)
+            self.entries[key] = os.path.getsize(entry)
+            self.evict()
+
+    def touch(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def evict(self):
+        # entries still mapped somewhere can't be deleted on every platform, they're retried on the next store
+        for key in list(self.entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self.entry_path(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self.total_bytes -= self.entries.pop(key)
+            self.evicted += 1
+
+    def chunk_key(self, block_rows, solid_halo, options):
+        # the halo holds the neighbor border slices, so edits next door change the key too
+        digest = hashlib.blake2b(MESH_CACHE_VERSION, digest_size=16)
+        digest.update(repr(sorted(options.items())).encode())
+        digest.update(block_rows.astype(np.int16).tobytes())
+        digest.update(np.packbits(solid_halo).tobytes())
+        return 'c' + digest.hexdigest()
+
+    def mesh(self, block_rows, solid_halo, **options):
+        # drop-in for mesh_chunk (safe to call from mesh worker threads)
+        key = self.chunk_key(block_rows, solid_halo, options)
+        content = self.load(key)
+        if content is None:
+            content = mesh_chunk(block_rows, solid_halo, **options)
+            self.store(key, content)
+        return content
+
+    def template_key(self, source):
+        # decor vertices also depend on the model itself
+        if source.name not in self.template_keys:
+            self.template_keys[source.name] = hashlib.blake2b(decor_template(source).tobytes(), digest_size=16).digest()
+        return self.template_keys[source.name]
+
+    def decor_key(self, items):
+        digest = hashlib.blake2b(MESH_CACHE_VERSION, digest_size=16)
+        sources = {item.source.name: item.source for item in items}
+        for name in sorted(sources):
+            digest.update(name.encode())
+            digest.update(self.template_key(sources[name]))
+        digest.update('\n'.join(item.source.name for item in items).encode())
+        digest.update(np.array([(*item.pos, item.rot.w, item.rot.x, item.rot.y, item.rot.z, *item.scale) for item in items], dtype=np.float32).tobytes())
+        return 'd' + digest.hexdigest()
+
+    def decor(self, items):
+        key = self.decor_key(items)
+        content = self.load(key)
+        if content is None:
+            content = np.concatenate([np.frombuffer(item.buffer, dtype=np.float32) for item in items])
+            self.store(key, content)
+        return content
@@ -0,0 +1,211 @@
+import re
+
+import numpy as np
+
+from .block import BLOCK_MAP, BLOCK_CACHE, N6_OFFSETS
+
+# per-block geometry from BlockReferenceGeometry indexed by [block map id, face, vertex]
+# faces follow N6_OFFSETS (front, back, right, left, top, bottom) and vertices are '3f 2f 3f'
+TEMPLATE_CACHE = {
+    'geometry': None,
+}
+
+# chunk axes that map to the texture's u and v for each face (matches gen_pane)
+FACE_UV_AXES = [(0, 1), (0, 1), (2, 1), (2, 1), (0, 2), (0, 2)]
+
+# texture atlas column of each face (matches gen_cube)
+FACE_TILE_COLUMNS = [2, 3, 4, 5, 0, 1]
+
+# unit quad corners (bottom left, bottom right, top left, top right) for each face
+FACE_CORNERS = np.array([
+    [(0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1)],
+    [(0, 0, 0), (0, 1, 0), (1, 0, 0), (1, 1, 0)],
+    [(1, 0, 0), (1, 1, 0), (1, 0, 1), (1, 1, 1)],
+    [(0, 0, 0), (0, 0, 1), (0, 1, 0), (0, 1, 1)],
+    [(0, 1, 0), (0, 1, 1), (1, 1, 0), (1, 1, 1)],
+    [(0, 0, 0), (1, 0, 0), (0, 0, 1), (1, 0, 1)],
+], dtype=np.int32)
+
+# two triangles per quad using the same winding as gen_pane
+QUAD_TRIANGLES = [0, 1, 2, 3, 2, 1]
+
+# corners emitted per quad when drawing with the shared quad index buffer
+QUAD_CORNERS = [0, 1, 2, 3]
+
+# bit offsets of the 'packed' vertex layout (decoded in chunk_packed.vert)
+# chunk-local position takes 5 bits per axis (0 - 16), then 3 bits of face and 8 bits of block map id
+PACKED_Y_SHIFT = 5
+PACKED_Z_SHIFT = 10
+PACKED_FACE_SHIFT = 15
+PACKED_BLOCK_SHIFT = 18
+
+def used_layout(program, layout):
+    # replaces the formats of attributes the program optimized away (such as uvs in the depth pre-pass) with padding
+    names = list(program)
+    formats = []
+    for attribute_format, name in zip(layout[0].split(), layout[1:]):
+        if name in names:
+            formats.append(attribute_format)
+        else:
+            count, kind, size = re.match(r'(\d*)([fiu])(\d?)', attribute_format).groups()
+            formats.append('%dx' % (int(count or 1) * int(size or 4)))
+    return [' '.join(formats)] + [name for name in layout[1:] if name in names]
+
+def block_templates():
+    if TEMPLATE_CACHE['geometry'] is None:
+        templates = np.zeros((len(BLOCK_MAP), 6, 6, 8), dtype=np.float64)
+        for block_id, block_num in BLOCK_MAP.items():
+            templates[block_num] = np.array(BLOCK_CACHE[block_id].raw_geometry, dtype=np.float64).reshape(6, 6, 8)
+        TEMPLATE_CACHE['geometry'] = templates
+    return TEMPLATE_CACHE['geometry']
+
+def exposed_faces(solid_halo):
+    # solid_halo is the chunk's solidity padded with a one voxel border from its neighbors
+    size = solid_halo.shape[0] - 2
+    solid = solid_halo[1:-1, 1:-1, 1:-1]
+    faces = np.empty(solid.shape + (6,), dtype=bool)
+    for i, offset in enumerate(N6_OFFSETS):
+        neighbor = solid_halo[1 + offset[0]:size + 1 + offset[0], 1 + offset[1]:size + 1 + offset[1], 1 + offset[2]:size + 1 + offset[2]]
+        faces[..., i] = solid & ~neighbor
+    return faces
+
+def cull_faces(block_rows, solid_halo):
+    # returns every visible face as (chunk positions, face indices, block map ids)
+    # ordered by block (C order over the voxel grid) and then by face like the per-block path
+    solid = block_rows >= 0
+    faces = exposed_faces(solid_halo)[solid]
+    positions = np.argwhere(solid)
+    block_index, face = np.nonzero(faces)
+    return positions[block_index], face, block_rows[solid][block_index]
+
+def greedy_faces(block_rows, solid_halo):
+    # merges coplanar faces of the same block into rectangles by joining maximal runs along u
+    # and then stacking identical runs along v
+    # returns (base positions, face indices, block map ids, sizes along each chunk axis)
+    faces = exposed_faces(solid_halo)
+    quads = []
+    for face in range(6):
+        u_axis, v_axis = FACE_UV_AXES[face]
+        normal_axis = 3 - u_axis - v_axis
+        grid = np.where(faces[..., face], block_rows, -1).transpose(normal_axis, v_axis, u_axis)
+
+        padded = np.full(grid.shape[:2] + (grid.shape[2] + 2,), -1, dtype=grid.dtype)
+        padded[..., 1:-1] = grid
+        starts = np.argwhere((grid >= 0) & (grid != padded[..., :-2]))
+        ends = np.argwhere((grid >= 0) & (grid != padded[..., 2:]))
+        if not len(starts):
+            continue
+
+        run_rows = grid[starts[:, 0], starts[:, 1], starts[:, 2]]
+        run_lengths = ends[:, 2] - starts[:, 2] + 1
+
+        # stack runs with the same slice, start, length and block on consecutive rows
+        order = np.lexsort((starts[:, 1], run_rows, run_lengths, starts[:, 2], starts[:, 0]))
+        keys = np.stack([starts[order, 0], starts[order, 2], run_lengths[order], run_rows[order]], axis=1)
+        v = starts[order, 1]
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = np.any(keys[1:] != keys[:-1], axis=1) | (v[1:] != v[:-1] + 1)
+        group_starts = np.nonzero(new_group)[0]
+        heights = np.diff(np.append(group_starts, len(order)))
+
+        count = len(group_starts)
+        positions = np.zeros((count, 3), dtype=np.int32)
+        positions[:, normal_axis] = keys[group_starts, 0]
+        positions[:, u_axis] = keys[group_starts, 1]
+        positions[:, v_axis] = v[group_starts]
+        sizes = np.ones((count, 3), dtype=np.int32)
+        sizes[:, u_axis] = keys[group_starts, 2]
+        sizes[:, v_axis] = heights
+        quads.append((positions, np.full(count, face), keys[group_starts, 3], sizes))
+
+    if not quads:
+        return np.zeros((0, 3), dtype=np.int32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int16), np.zeros((0, 3), dtype=np.int32)
+    return tuple(np.concatenate(part) for part in zip(*quads))
+
+def downsample_rows(block_rows, factor):
+    # one cell per factor^3 voxels, solid when any of them are (thin surface layers would vanish otherwise)
+    # and using the block of its highest solid voxel so surfaces keep their top texture
+    size = block_rows.shape[0] // factor
+    cells = block_rows.reshape(size, factor, size, factor, size, factor).transpose(0, 2, 4, 1, 3, 5)
+
+    rows = np.full((size, size, size), -1, dtype=block_rows.dtype)
+    for y in range(factor):
+        layer = cells[:, :, :, :, y, :].max(axis=(3, 4))
+        rows = np.where(layer >= 0, layer, rows)
+    return rows
+
+def lod_halo(rows):
+    # borders are left open so every face on the chunk's edge is kept as a skirt over cracks between LODs
+    halo = np.zeros(tuple(v + 2 for v in rows.shape), dtype=bool)
+    halo[1:-1, 1:-1, 1:-1] = rows >= 0
+    return halo
+
+def quad_indices(quad_count):
+    return (np.arange(quad_count, dtype=np.uint32)[:, None] * len(QUAD_CORNERS) + np.array(QUAD_TRIANGLES, dtype=np.uint32)).reshape(-1)
+
+def build_tiled_vertices(positions, face, rows, sizes, tile_count, vertex_order=QUAD_TRIANGLES):
+    # '3f 2f 3f 2f' with uvs in block units and the atlas tile origin so the tile can repeat across merged quads
+    corners = positions[:, None, :] + FACE_CORNERS[face] * sizes[:, None, :]
+    corners = corners[:, vertex_order]
+
+    uv_axes = np.array(FACE_UV_AXES)[face]
+    uvs = np.stack([np.take_along_axis(corners, uv_axes[:, None, i:i + 1], axis=2)[..., 0] for i in range(2)], axis=-1)
+
+    normals = np.array(N6_OFFSETS, dtype=np.float32)[face]
+    tiles = np.stack([np.array(FACE_TILE_COLUMNS)[face] / 6, (tile_count - 1 - rows) / tile_count], axis=-1)
+
+    vertices = np.empty((len(face), len(vertex_order), 10), dtype=np.float32)
+    vertices[..., 0:3] = corners
+    vertices[..., 3:5] = uvs
+    vertices[..., 5:8] = normals[:, None, :]
+    vertices[..., 8:10] = tiles[:, None, :]
+    return vertices.reshape(-1, 10)
+
+def build_packed_vertices(positions, face, rows, sizes, vertex_order=QUAD_TRIANGLES):
+    # one uint32 per vertex, everything else is rebuilt from the face and block id in the shader
+    corners = (positions[:, None, :] + FACE_CORNERS[face] * sizes[:, None, :]).astype(np.uint32)
+    corners = corners[:, vertex_order]
+
+    attributes = (face.astype(np.uint32) << PACKED_FACE_SHIFT) | (rows.astype(np.uint32) << PACKED_BLOCK_SHIFT)
+    vertices = corners[..., 0] | (corners[..., 1] << PACKED_Y_SHIFT) | (corners[..., 2] << PACKED_Z_SHIFT) | attributes[:, None]
+    return vertices.reshape(-1)
+
+def build_vertices(positions, face, rows, vertex_order=QUAD_TRIANGLES):
+    # template vertices 0 - 3 of each face are its quad corners
+    vertices = block_templates()[rows[:, None], face[:, None], vertex_order]
+    vertices[..., :3] += positions[:, None, :]
+    return vertices.astype(np.float32).reshape(-1, 8)
+
+def mesh_chunk(block_rows, solid_halo, vertex_format='float', greedy=False, tile_count=1, indexed=False):
+    # returns one row per vertex; indexed meshes hold 4 corners per quad for the shared quad index buffer
+    vertex_order = QUAD_CORNERS if indexed else QUAD_TRIANGLES
+    if greedy:
+        quads = greedy_faces(block_rows, solid_halo)
+    else:
+        positions, face, rows = cull_faces(block_rows, solid_halo)
+        if vertex_format == 'float':
+            return build_vertices(positions, face, rows, vertex_order=vertex_order)
+        quads = (positions, face, rows, np.ones_like(positions))
+
+    if vertex_format == 'packed':
+        return build_packed_vertices(*quads, vertex_order=vertex_order)
+    return build_tiled_vertices(*quads, tile_count, vertex_order=vertex_order)
+
+
+def slot_vertices(positions, rows, flags, vertex_format='float', tile_count=1, indexed=False):
+    # every block gets all 6 faces so its slot has a fixed size, hidden faces collapse to degenerate quads
+    vertex_order = QUAD_CORNERS if indexed else QUAD_TRIANGLES
+    face = np.tile(np.arange(6), len(positions))
+    block_positions = np.repeat(positions, 6, axis=0)
+    block_rows = np.repeat(rows, 6)
+
+    if vertex_format == 'float':
+        vertices = build_vertices(block_positions, face, block_rows, vertex_order=vertex_order)
+    elif vertex_format == 'packed':
+        vertices = build_packed_vertices(block_positions, face, block_rows, np.ones_like(block_positions), vertex_order=vertex_order)
+    else:
+        vertices = build_tiled_vertices(block_positions, face, block_rows, np.ones_like(block_positions), tile_count, vertex_order=vertex_order)
+
+    vertices = vertices.reshape(len(face), len(vertex_order), -1)
+    vertices[~flags.reshape(-1)] = 0
+    return vertices.reshape(len(face) * len(vertex_order), -1)
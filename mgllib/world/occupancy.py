@@ -0,0 +1,108 @@
+import numpy as np
+
+from .const import CHUNK_SIZE
+
+# chunk ids are packed into one int64 key with 21 bits per axis so lookups can use searchsorted
+KEY_BITS = 21
+KEY_OFFSET = 1 << (KEY_BITS - 1)
+
+def chunk_keys(chunk_ids):
+    ids = np.asarray(chunk_ids, dtype=np.int64) + KEY_OFFSET
+    return (ids[..., 0] << (KEY_BITS * 2)) | (ids[..., 1] << KEY_BITS) | ids[..., 2]
+
+class OccupancyIndex:
+    def __init__(self, capacity=64):
+        # solidity of every chunk packed 8 voxels per byte along z with one (16, 16, 2) slab per chunk
+        # slabs are refreshed from the voxels lazily so chunks mapped from region files stay unread until queried
+        self.bits = np.zeros((capacity, CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE // 8), dtype=np.uint8)
+        self.stale = np.zeros(capacity, dtype=bool)
+        self.chunks = []
+        self.slots = {}
+
+        # sorted chunk keys and their slots, rebuilt on the first query after a chunk is added
+        self.keys = None
+        self.key_slots = None
+
+    def add(self, chunk):
+        # chunks replacing one with the same id (such as on world load) take over its slot
+        slot = self.slots.get(chunk.chunk_id)
+        if slot is None:
+            slot = len(self.chunks)
+            self.chunks.append(chunk)
+            self.slots[chunk.chunk_id] = slot
+            if slot >= len(self.bits):
+                self.bits = np.concatenate([self.bits, np.zeros_like(self.bits)])
+                self.stale = np.concatenate([self.stale, np.zeros_like(self.stale)])
+            self.keys = None
+        else:
+            self.chunks[slot] = chunk
+        self.stale[slot] = True
+
+    def invalidate(self, chunk):
+        # for bulk writes, the slab is rebuilt from the voxels when it's next needed
+        self.stale[self.slots[chunk.chunk_id]] = True
+
+    def set(self, chunk, chunk_pos, solid):
+        slot = self.slots[chunk.chunk_id]
+        if not self.stale[slot]:
+            bit = np.uint8(1 << (chunk_pos[2] & 7))
+            if solid:
+                self.bits[slot, chunk_pos[0], chunk_pos[1], chunk_pos[2] >> 3] |= bit
+            else:
+                self.bits[slot, chunk_pos[0], chunk_pos[1], chunk_pos[2] >> 3] &= ~bit
+
+    def refresh(self, slots):
+        for slot in slots:
+            if self.stale[slot]:
+                self.bits[slot] = np.packbits(self.chunks[slot].voxels != 0, axis=2, bitorder='little')
+                self.stale[slot] = False
+
+    def lookup(self, chunk_ids):
+        # slot of each chunk id with -1 where there's no chunk
+        if self.keys is None:
+            keys = chunk_keys(list(self.slots)) if self.slots else np.zeros(0, dtype=np.int64)
+            order = np.argsort(keys)
+            self.keys = keys[order]
+            self.key_slots = np.array(list(self.slots.values()), dtype=np.int64)[order]
+
+        keys = chunk_keys(chunk_ids)
+        if not len(self.keys):
+            return np.full(keys.shape, -1, dtype=np.int64)
+        index = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[index] == keys, self.key_slots[index], -1)
+
+    def solid_mask(self, positions):
+        # positions is an (..., 3) array of block positions, returns a bool array of the same leading shape
+        positions = np.asarray(positions, dtype=np.int64)
+        slots = self.lookup(positions // CHUNK_SIZE)
+        found = slots >= 0
+        self.refresh(np.unique(slots[found]))
+
+        local = positions % CHUNK_SIZE
+        safe_slots = np.maximum(slots, 0)
+        packed = self.bits[safe_slots, local[..., 0], local[..., 1], local[..., 2] >> 3]
+        return found & ((packed >> (local[..., 2] & 7)) & 1).astype(bool)
+
+    def solid_region(self, aabb):
+        # aabb is (min block, max block) with max exclusive, returns a bool array indexed [x, y, z] from min
+        low = tuple(int(v) for v in aabb[0])
+        high = tuple(int(v) for v in aabb[1])
+        region = np.zeros(tuple(max(0, high[i] - low[i]) for i in range(3)), dtype=bool)
+        if not region.size:
+            return region
+
+        first = tuple(low[i] // CHUNK_SIZE for i in range(3))
+        last = tuple((high[i] - 1) // CHUNK_SIZE for i in range(3))
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                for z in range(first[2], last[2] + 1):
+                    slot = self.slots.get((x, y, z))
+                    if slot is None:
+                        continue
+                    self.refresh([slot])
+                    chunk_origin = (x * CHUNK_SIZE, y * CHUNK_SIZE, z * CHUNK_SIZE)
+                    start = tuple(max(low[i], chunk_origin[i]) for i in range(3))
+                    end = tuple(min(high[i], chunk_origin[i] + CHUNK_SIZE) for i in range(3))
+                    solid = np.unpackbits(self.bits[slot], axis=2, bitorder='little')
+                    region[tuple(slice(start[i] - low[i], end[i] - low[i]) for i in range(3))] = solid[tuple(slice(start[i] - chunk_origin[i], end[i] - chunk_origin[i]) for i in range(3))]
+        return region
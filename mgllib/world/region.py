@@ -0,0 +1,160 @@
+import os
+import json
+import mmap
+
+import glm
+import numpy as np
+
+from .const import CHUNK_SIZE
+
+# region files hold a cube of REGION_SIZE chunks per axis
+# the header is the magic, version and region size followed by one int32 record index per chunk (-1 when absent)
+# padded to a page so every record starts page aligned and can be mapped straight into a chunk's voxels
+REGION_SIZE = 8
+REGION_MAGIC = b'MGLR'
+REGION_VERSION = 1
+REGION_HEADER_BYTES = 4096
+RECORD_BYTES = CHUNK_SIZE ** 3
+
+# palettes, block counts and decor live next to the region files
+WORLD_META = 'world.json'
+
+def region_id(chunk_id):
+    return tuple(chunk_id[i] // REGION_SIZE for i in range(3))
+
+def region_slot(chunk_id):
+    local = tuple(chunk_id[i] % REGION_SIZE for i in range(3))
+    return (local[0] * REGION_SIZE + local[1]) * REGION_SIZE + local[2]
+
+def region_path(path, region):
+    return os.path.join(path, 'r.%d.%d.%d.region' % region)
+
+def write_region(file_path, chunk_voxels):
+    # chunk_voxels maps chunk ids to uint8 voxel arrays
+    index = np.full(REGION_SIZE ** 3, -1, dtype=np.int32)
+    header = bytearray(REGION_HEADER_BYTES)
+    header[:4] = REGION_MAGIC
+    header[4:12] = np.array([REGION_VERSION, REGION_SIZE], dtype=np.int32).tobytes()
+
+    # written beside the old file and swapped in (save_world() closes any map of the old one first)
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        for i, chunk_id in enumerate(chunk_voxels):
+            index[region_slot(chunk_id)] = i
+            f.write(np.ascontiguousarray(chunk_voxels[chunk_id]).tobytes())
+        f.seek(12)
+        f.write(index.tobytes())
+    os.replace(temp_path, file_path)
+
+class RegionFile:
+    def __init__(self, file_path):
+        self.path = file_path
+        with open(file_path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:4] != REGION_MAGIC:
+            raise ValueError('not a region file: ' + file_path)
+        version, size = np.frombuffer(self.map, dtype=np.int32, count=2, offset=4)
+        if (version != REGION_VERSION) or (size != REGION_SIZE):
+            raise ValueError('unsupported region file: ' + file_path)
+
+        self.index = np.frombuffer(self.map, dtype=np.int32, count=REGION_SIZE ** 3, offset=12)
+
+    def voxels(self, chunk_id):
+        # read only view into the mapped file, nothing is read from disk until the pages are touched
+        record = int(self.index[region_slot(chunk_id)])
+        return np.frombuffer(self.map, dtype=np.uint8, count=RECORD_BYTES, offset=REGION_HEADER_BYTES + record * RECORD_BYTES).reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+
+    def close(self):
+        # every view of the map has to be gone first (mmap raises BufferError otherwise)
+        self.index = None
+        self.map.close()
+
+def close_regions(world, path):
+    # windows can't replace or remove a file while it's mapped, so chunks mapping a region file in path
+    # get their own copy of the voxels and those maps are closed
+    directory = os.path.realpath(path)
+    closing = [region for region in world.region_files if os.path.dirname(os.path.realpath(region.path)) == directory]
+    if not closing:
+        return
+    for chunk in world.chunks.values():
+        if chunk.region_file in closing:
+            chunk.detach_region()
+    for region in closing:
+        region.close()
+        world.region_files.remove(region)
+
+def release_regions(world):
+    # closes the region files no chunk maps any more
+    mapped = {chunk.region_file for chunk in world.chunks.values()}
+    for region in [region for region in world.region_files if region not in mapped]:
+        region.close()
+        world.region_files.remove(region)
+
+def save_world(world, path):
+    os.makedirs(path, exist_ok=True)
+    close_regions(world, path)
+
+    regions = {}
+    meta = {'version': REGION_VERSION, 'chunks': {}, 'decor': []}
+    for chunk_id, chunk in world.chunks.items():
+        if chunk.block_count:
+            if chunk.voxels.dtype != np.uint8:
+                raise ValueError('chunk %s has more than 256 block types and cannot be saved' % (chunk_id,))
+            regions.setdefault(region_id(chunk_id), {})[chunk_id] = chunk.voxels
+            meta['chunks']['%d,%d,%d' % chunk_id] = {'palette': chunk.palette[1:], 'block_count': chunk.block_count}
+
+        for group in chunk.decor.values():
+            for decor in group:
+                meta['decor'].append({
+                    'source': decor.source.name,
+                    'pos': list(decor.pos),
+                    'rot': [decor.rot.w, decor.rot.x, decor.rot.y, decor.rot.z],
+                    'scale': list(decor.scale),
+                })
+
+    for region, chunk_voxels in regions.items():
+        write_region(region_path(path, region), chunk_voxels)
+
+    # regions that no longer hold any chunks
+    for name in os.listdir(path):
+        if name.endswith('.region') and (tuple(int(v) for v in name.split('.')[1:4]) not in regions):
+            os.remove(os.path.join(path, name))
+
+    with open(os.path.join(path, WORLD_META), 'w') as f:
+        json.dump(meta, f)
+
+def load_world(world, path, decor_sources=()):
+    # decor models are looked up by name (the same name decor is grouped by within a chunk)
+    from .chunk import Chunk
+    from .decor import Decor
+
+    with open(os.path.join(path, WORLD_META)) as f:
+        meta = json.load(f)
+    if meta['version'] != REGION_VERSION:
+        raise ValueError('unsupported world version: %s' % meta['version'])
+
+    regions = {}
+    for key, info in meta['chunks'].items():
+        chunk_id = tuple(int(v) for v in key.split(','))
+        region = region_id(chunk_id)
+        if region not in regions:
+            regions[region] = RegionFile(region_path(path, region))
+
+        if chunk_id in world.chunks:
+            world.chunks[chunk_id].discard()
+        chunk = Chunk(world, chunk_id)
+        chunk.load_voxels(lambda region=regions[region], chunk_id=chunk_id: region.voxels(chunk_id), info['palette'], info['block_count'], region_file=regions[region])
+        world.chunks[chunk_id] = chunk
+
+    # the cull cache still holds the replaced chunks
+    world.visible_chunks = []
+    world.cull_key = None
+    release_regions(world)
+    world.region_files += regions.values()
+
+    sources = {source.name: source for source in decor_sources}
+    for item in meta['decor']:
+        if item['source'] in sources:
+            world.add_decor(Decor(sources[item['source']], pos=glm.vec3(item['pos']), rot=glm.quat(*item['rot']), scale=glm.vec3(item['scale'])))
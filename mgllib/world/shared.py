@@ -0,0 +1,226 @@
+import os
+import time
+import atexit
+import secrets
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .const import CHUNK_SIZE
+from .occupancy import chunk_keys
+
+# segment layout: int64 header (generation, chunk count, capacity, successor), an int64 (x, y, z, stamp) row per chunk
+# and then one CHUNK_SIZE^3 uint8 record per chunk holding BLOCK_MAP id + 1 (0 for air)
+# successor is 0 while the segment is current, the index of the segment that replaced it and -1 once the mirror is closed
+HEADER_FIELDS = 4
+TABLE_FIELDS = 4
+RECORD_BYTES = CHUNK_SIZE ** 3
+SUCCESSOR_CLOSED = -1
+
+# views give up following successors after this many missing segments
+MAX_SEGMENT_SKIPS = 64
+
+def segment_name(base_name, index):
+    return '%s_%d' % (base_name, index)
+
+def segment_bytes(capacity):
+    return (HEADER_FIELDS + capacity * TABLE_FIELDS) * 8 + capacity * RECORD_BYTES
+
+def segment_views(buffer, capacity):
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buffer)
+    table = np.ndarray((capacity, TABLE_FIELDS), dtype=np.int64, buffer=buffer, offset=HEADER_FIELDS * 8)
+    records = np.ndarray((capacity, CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8, buffer=buffer, offset=(HEADER_FIELDS + capacity * TABLE_FIELDS) * 8)
+    return header, table, records
+
+class SharedVoxels:
+    def __init__(self, world, capacity=4096):
+        # mirror of every chunk's voxels in shared memory, owned and written by the main process
+        # the generation is odd while sync() writes so readers can tell a torn read from a clean one
+        # and every chunk row carries the generation it was last written in
+        # once the chunks outgrow the capacity the mirror moves to a segment twice the size (named base_name_1,
+        # base_name_2 and so on) and the old segment's successor field sends attached views after it
+        self.world = world
+        self.capacity = capacity
+        self.base_name = 'mglvox_%d_%s' % (os.getpid(), secrets.token_hex(4))
+        self.segment = 0
+        self.memory = shared_memory.SharedMemory(name=segment_name(self.base_name, self.segment), create=True, size=segment_bytes(capacity))
+        self.name = self.memory.name
+        self.header, self.table, self.records = segment_views(self.memory.buf, capacity)
+        self.header[:] = (0, 0, capacity, 0)
+
+        self.slots = {}
+        self.dirty = set(world.chunks.values())
+
+        # the segment outlives the process otherwise (World.delete() closes it sooner)
+        atexit.register(self.close)
+
+    @property
+    def generation(self):
+        return int(self.header[0])
+
+    def grow(self, chunk_count):
+        capacity = self.capacity
+        while capacity < chunk_count:
+            capacity *= 2
+
+        count = len(self.slots)
+        memory = shared_memory.SharedMemory(name=segment_name(self.base_name, self.segment + 1), create=True, size=segment_bytes(capacity))
+        header, table, records = segment_views(memory.buf, capacity)
+        # odd until the copy is done in case a view that skipped ahead attaches early
+        header[:] = (self.generation + 1, count, capacity, 0)
+        table[:count] = self.table[:count]
+        records[:count] = self.records[:count]
+        header[0] = self.generation
+
+        # views still on the old segment move over on their next read
+        self.segment += 1
+        self.header[3] = self.segment
+        self.release_segment()
+        self.memory = memory
+        self.name = memory.name
+        self.capacity = capacity
+        self.header, self.table, self.records = header, table, records
+
+    def sync(self):
+        # copies every chunk changed since the last sync, returns the number written
+        if not self.dirty:
+            return 0
+
+        new_chunks = sum(1 for chunk in self.dirty if chunk.chunk_id not in self.slots)
+        if len(self.slots) + new_chunks > self.capacity:
+            self.grow(len(self.slots) + new_chunks)
+
+        generation = self.generation + 2
+        self.header[0] = generation - 1
+        written = 0
+        for chunk in self.dirty:
+            slot = self.slots.get(chunk.chunk_id)
+            if slot is None:
+                slot = len(self.slots)
+                self.slots[chunk.chunk_id] = slot
+                self.table[slot, :3] = chunk.chunk_id
+            self.records[slot] = chunk.block_rows + 1
+            self.table[slot, 3] = generation
+            written += 1
+        self.header[1] = len(self.slots)
+        self.header[0] = generation
+        self.dirty = set()
+        return written
+
+    def release_segment(self):
+        self.header = self.table = self.records = None
+        self.memory.close()
+        self.memory.unlink()
+
+    def close(self):
+        # safe to call more than once, attached views raise on their next read
+        if self.memory is None:
+            return
+        self.header[3] = SUCCESSOR_CLOSED
+        self.release_segment()
+        self.memory = None
+        atexit.unregister(self.close)
+
+class SharedVoxelView:
+    def __init__(self, name):
+        # read only view for worker processes, pickles as just the segment name
+        # reads follow the owner to a bigger segment when the mirror grows
+        self.base_name, segment = name.rsplit('_', 1)
+        self.memory = None
+        self.attach(int(segment))
+
+    def attach(self, segment):
+        # child processes share the owner's resource tracker, so attaching doesn't make them unlink it on exit
+        memory = None
+        for index in range(segment, segment + MAX_SEGMENT_SKIPS):
+            try:
+                memory = shared_memory.SharedMemory(name=segment_name(self.base_name, index))
+                break
+            except FileNotFoundError:
+                # the owner can grow again before a view catches up, the segments in between are gone by then
+                continue
+        if memory is None:
+            raise FileNotFoundError('shared voxel mirror %s is gone' % segment_name(self.base_name, segment))
+
+        if self.memory:
+            self.close()
+        self.memory = memory
+        self.name = memory.name
+
+        # the capacity is the first thing a growing owner writes
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.memory.buf)
+        while not header[2]:
+            time.sleep(0)
+        capacity = int(header[2])
+        del header
+        self.header, self.table, self.records = segment_views(self.memory.buf, capacity)
+        for view in (self.header, self.table, self.records):
+            view.flags.writeable = False
+
+        self.chunk_count = 0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.key_slots = np.zeros(0, dtype=np.int64)
+
+    def __getstate__(self):
+        return self.name
+
+    def __setstate__(self, name):
+        self.__init__(name)
+
+    @property
+    def generation(self):
+        return int(self.header[0])
+
+    def chunk_stamp(self, chunk_id):
+        # generation the chunk was last written in (-1 when it isn't mirrored)
+        slot = self.lookup(np.array(chunk_id))
+        return int(self.table[slot, 3]) if slot >= 0 else -1
+
+    def lookup(self, chunk_ids):
+        count = int(self.header[1])
+        if count != self.chunk_count:
+            keys = chunk_keys(self.table[:count, :3])
+            order = np.argsort(keys)
+            self.keys = keys[order]
+            self.key_slots = order
+            self.chunk_count = count
+
+        keys = chunk_keys(chunk_ids)
+        if not len(self.keys):
+            return np.full(keys.shape, -1, dtype=np.int64)
+        index = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[index] == keys, self.key_slots[index], -1)
+
+    def read(self, query):
+        # runs query() until it completes without the owner syncing underneath it
+        while True:
+            successor = int(self.header[3])
+            if successor == SUCCESSOR_CLOSED:
+                raise ValueError('shared voxel mirror %s was closed' % self.name)
+            if successor:
+                self.attach(successor)
+                continue
+            generation = self.generation
+            if generation % 2:
+                time.sleep(0)
+                continue
+            result = query()
+            if self.generation == generation:
+                return result
+
+    def block_rows(self, positions):
+        # BLOCK_MAP id at each (..., 3) block position with -1 for air and unknown chunks
+        def query():
+            positions_array = np.asarray(positions, dtype=np.int64)
+            slots = self.lookup(positions_array // CHUNK_SIZE)
+            local = positions_array % CHUNK_SIZE
+            rows = self.records[np.maximum(slots, 0), local[..., 0], local[..., 1], local[..., 2]].astype(np.int16) - 1
+            return np.where(slots >= 0, rows, -1)
+        return self.read(query)
+
+    def solid_mask(self, positions):
+        return self.block_rows(positions) >= 0
+
+    def close(self):
+        self.header = self.table = self.records = None
+        self.memory.close()
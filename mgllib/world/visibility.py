@@ -0,0 +1,100 @@
+from collections import deque
+
+import numpy as np
+
+from .block import N6_OFFSETS
+from .const import CHUNK_SIZE
+
+# face index on the other side of each face in N6_OFFSETS
+OPPOSITE_FACES = [1, 0, 3, 2, 5, 4]
+
+# voxel layer of each face in N6_OFFSETS
+FACE_LAYERS = [
+    (slice(None), slice(None), CHUNK_SIZE - 1),
+    (slice(None), slice(None), 0),
+    (CHUNK_SIZE - 1, slice(None), slice(None)),
+    (0, slice(None), slice(None)),
+    (slice(None), CHUNK_SIZE - 1, slice(None)),
+    (slice(None), 0, slice(None)),
+]
+
+ALL_CONNECTED = np.ones((6, 6), dtype=bool)
+
+def air_components(air):
+    # labels every air voxel with the smallest flat index in its 6-connected region (-1 for solids)
+    size = air.size
+    labels = np.where(air, np.arange(size).reshape(air.shape), size)
+    while True:
+        previous = labels
+        labels = labels.copy()
+        for axis in range(3):
+            for direction in (1, -1):
+                shifted = np.full_like(labels, size)
+                src = [slice(None)] * 3
+                dst = [slice(None)] * 3
+                src[axis] = slice(0, -1) if direction == 1 else slice(1, None)
+                dst[axis] = slice(1, None) if direction == 1 else slice(0, -1)
+                shifted[tuple(dst)] = labels[tuple(src)]
+                labels = np.where(air, np.minimum(labels, shifted), size)
+
+        # pointer jumping through each label's own label speeds up long winding regions
+        flat = np.append(labels.reshape(-1), size)
+        labels = np.where(air, flat[labels], size)
+
+        if np.array_equal(labels, previous):
+            return np.where(air, labels, -1)
+
+def face_connectivity(voxels):
+    # which pairs of chunk faces can see each other through air inside the chunk
+    air = voxels == 0
+    if air.all():
+        return ALL_CONNECTED.copy()
+
+    connected = np.zeros((6, 6), dtype=bool)
+    if not air.any():
+        return connected
+
+    labels = air_components(air)
+    face_labels = [np.unique(labels[layer]) for layer in FACE_LAYERS]
+    face_labels = [face[face >= 0] for face in face_labels]
+    for a in range(6):
+        for b in range(a, 6):
+            if len(np.intersect1d(face_labels[a], face_labels[b], assume_unique=True)):
+                connected[a, b] = connected[b, a] = True
+    return connected
+
+def reachable_chunks(world, start_id):
+    # breadth first flood fill from the camera's chunk through faces that connect inside each chunk
+    # chunks that don't exist are open air, and the search never turns back along an axis it has travelled
+    # a chunk can be entered once through each of its faces since the face decides where it can be left from
+    if not world.chunks:
+        return set()
+
+    ids = np.array(list(world.chunks))
+    low = ids.min(axis=0) - 1
+    high = ids.max(axis=0) + 1
+
+    # a camera outside the world starts from the open layer of chunks around it
+    start_id = tuple(int(min(max(start_id[i], low[i]), high[i])) for i in range(3))
+
+    reachable = {start_id}
+    visited = set()
+    queue = deque([(start_id, None, 0)])
+    while queue:
+        chunk_id, entered, travelled = queue.popleft()
+        chunk = world.chunks.get(chunk_id)
+        connectivity = chunk.face_visibility if chunk else ALL_CONNECTED
+        for face, offset in enumerate(N6_OFFSETS):
+            if travelled & (1 << OPPOSITE_FACES[face]):
+                continue
+            if (entered is not None) and (not connectivity[entered, face]):
+                continue
+            neighbor_id = (chunk_id[0] + offset[0], chunk_id[1] + offset[1], chunk_id[2] + offset[2])
+            if (neighbor_id, OPPOSITE_FACES[face]) in visited:
+                continue
+            if any((neighbor_id[i] < low[i]) or (neighbor_id[i] > high[i]) for i in range(3)):
+                continue
+            visited.add((neighbor_id, OPPOSITE_FACES[face]))
+            reachable.add(neighbor_id)
+            queue.append((neighbor_id, OPPOSITE_FACES[face], travelled | (1 << face)))
+    return reachable
@@ -1,11 +1,27 @@
 import math
+import time
+import queue
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import astar
+import numpy as np
 
 from ..elements import ElementSingleton, Element
 from .chunk import Chunk, CHUNK_SIZE, BLOCK_SCALE
-from .block import populate_block_cache
-from .const import MaxDepthReached
+from .block import populate_block_cache, CACHE, TEXTURE_RESOLUTION, N7_OFFSETS, N6_OFFSETS, BLOCK_MAP, BLOCK_DURABILITY
+from .mesher import quad_indices, mesh_chunk
+from .frustum import Frustum
+from .visibility import reachable_chunks
+from .region import save_world, load_world
+from .mesh_cache import MeshCache, MESH_CACHE_MAX_BYTES
+from .arena import ChunkArena
+from .gpu_mesher import GPUMesher
+from .far_field import FarField
+from .occupancy import OccupancyIndex
+from .shared import SharedVoxels
+from .const import MaxDepthReached, CHUNK_FORMATS, CHUNK_SHADERS, CHUNK_DEPTH_SHADERS, DEPTH_FRAGMENT_SHADER, MAX_CHUNK_QUADS, DEFAULT_REBUILD_BUDGET
 
 VALID_MOVEMENT_DIRECTIONS = [
     (1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1),
@@ -49,15 +65,208 @@ class Pathfinder(astar.AStar):
     def is_goal_reached(self, current, goal):
         return current == goal
 
+class WorldEdit:
+    # collects block edits and rebuilds every affected chunk once when the outermost edit closes
+    # nested world.edit() blocks join the open transaction
+    def __init__(self, world, rebuild=True):
+        self.world = world
+        self.rebuild = rebuild
+        self.depth = 0
+        self.positions = set()
+        self.joined = None
+
+    def __enter__(self):
+        # the transaction only opens here, so an edit() that never enters a with block defers nothing
+        if not self.world.transaction:
+            self.world.transaction = self
+        self.joined = self.world.transaction
+        self.joined.depth += 1
+        return self.joined
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.joined.leave()
+
+    def leave(self):
+        # edits are applied as they happen, so the rebuild runs even if the block raised
+        self.depth -= 1
+        if not self.depth:
+            self.world.transaction = None
+            if self.rebuild and (self.world.buffer_mode == 'slots'):
+                self.world.update_slots(*self.positions)
+            elif self.rebuild:
+                self.world.rebuild_chunks(self.dirty_chunks(), neighbors=False)
+
+    def add_block(self, block_id, world_pos):
+        self.world.add_block(block_id, world_pos)
+
+    def remove_block(self, world_pos):
+        self.world.remove_block(world_pos)
+
+    def dirty_chunks(self):
+        # chunks holding an edit plus neighbors whose border faces an edit could expose or cover
+        dirty = set()
+        for world_pos in self.positions:
+            chunk = self.world.chunks.get(tuple(world_pos[i] // CHUNK_SIZE for i in range(3)))
+            if chunk:
+                dirty.add(chunk)
+                dirty.update(chunk.border_neighbors(world_pos))
+        return dirty
+
+class MeasuredDraws:
+    # adds a query's counts to world.render_stats, keys are any of 'samples', 'primitives' and 'prepass_samples'
+    def __init__(self, world, keys):
+        self.world = world
+        self.keys = keys
+
+    def __enter__(self):
+        self.world.query.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.world.query.__exit__(exc_type, exc_value, traceback)
+        for key in self.keys:
+            self.world.render_stats[key] += self.world.query.primitives if key == 'primitives' else self.world.query.samples
+
 class World(ElementSingleton):
-    def __init__(self, program):
+    def __init__(self, program, mesher='numpy', greedy=False, vertex_format='float', indexed=True, mesh_workers=0, upload_cap=4, buffer_mode='mesh', rebuild_budget=None, frustum_culling=True, shared_cull=False, occlusion_culling=False, stream_radius=None, vram_budget=None, mesh_cache=None, mesh_cache_bytes=MESH_CACHE_MAX_BYTES, lod_distances=None, expanded_chunk_limit=None, front_to_back=True, depth_prepass=False, query_stats=False, far_field_distance=None, far_field_factor=1, destructible=False):
         super().__init__()
 
         self.chunks = {}
         self.program = program
 
+        # bit-packed solidity of every chunk for batched queries (see solid_mask() and solid_region())
+        self.occupancy = OccupancyIndex()
+
+        # with a limit frame_update() compresses the least recently read chunks' voxels
+        # until at most expanded_chunk_limit chunks hold dense voxels, reads inflate them again transparently
+        self.expanded_chunk_limit = expanded_chunk_limit
+        self.expanded_chunks = set()
+
+        # RegionFiles that loaded chunks map their voxels from (see load())
+        self.region_files = []
+
+        # optional SharedVoxels mirror for worker processes (see share_voxels())
+        self.shared_voxels = None
+        self.frame_index = 0
+
+        # streaming keeps GPU buffers only for chunks within stream_radius (world units) of the PlayerBody
+        # chunks that leave the radius stay on the GPU until vram_budget (bytes) is exceeded and are then
+        # evicted least recently used first (without a budget they are evicted as soon as they leave)
+        self.stream_radius = stream_radius
+        self.vram_budget = vram_budget
+        self.streamed_chunks = set()
+        self.evictable_chunks = OrderedDict()
+        # running totals kept up to date by the chunks (see Chunk.account_gpu_bytes())
+        self.resident_count = 0
+        self.gpu_bytes = 0
+        self.stream_center = None
+        self.stream_chunk_count = 0
+        self.stream_stats = {'resident': 0, 'loaded': 0, 'evicted': 0, 'gpu_bytes': 0}
+
+        # 'numpy' culls whole chunks with array shifts, 'reference' meshes block by block
+        # and 'gpu' culls faces in a compute shader that writes the vertices without them passing through the CPU
+        self.mesher = mesher
+
+        # greedy meshing merges coplanar faces, so the atlas tile has to repeat in the shader
+        # (the gpu mesher only culls and always writes 'packed' vertices)
+        self.greedy = greedy and (self.mesher != 'gpu')
+        self.vertex_format = 'packed' if self.mesher == 'gpu' else vertex_format
+        if self.greedy and (self.vertex_format == 'float'):
+            self.vertex_format = 'tiled'
+        self.chunk_format = CHUNK_FORMATS[self.vertex_format]
+        self.chunk_program = self.program
+        if self.vertex_format in CHUNK_SHADERS:
+            self.chunk_program = self.e['MGL'].program(*CHUNK_SHADERS[self.vertex_format])
+
+        # chunk meshes store 4 corners per face and share one pre-generated quad index buffer
+        # (the per-block reference mesher always emits 6 vertices per face)
+        self.indexed = indexed and (self.mesher != 'reference')
+        self.index_buffer = None
+        if self.indexed:
+            self.index_buffer = self.e['MGL'].ctx.buffer(data=quad_indices(MAX_CHUNK_QUADS))
+
+        # 'mesh' uploads a new buffer per rebuild, 'slots' gives each block a fixed range of a persistent
+        # buffer so edits only rewrite the slots of the edited block and its neighbors
+        # and 'arena' sub-allocates every mesh from one buffer and draws all visible terrain in a single call
+        self.buffer_mode = buffer_mode
+
+        # destructible worlds let bullet impacts chip away blocks (see damage_block())
+        # slot buffers patch a break in place, other buffer modes queue the chunks it touches so bursts of fire
+        # are remeshed from frame_update() within rebuild_budget (or DEFAULT_REBUILD_BUDGET without one)
+        self.destructible = destructible
+        self.block_damage = {}
+
+        # optional directory of finished chunk and decor meshes keyed by a hash of their inputs
+        # holding at most mesh_cache_bytes (least recently used entries are deleted first)
+        self.mesh_cache = MeshCache(mesh_cache, max_bytes=mesh_cache_bytes) if mesh_cache else None
+
         populate_block_cache()
 
+        self.tile_count = int(CACHE['texture'].height // TEXTURE_RESOLUTION)
+        self.tile_size = (1 / 6, 1 / self.tile_count)
+
+        self.arena = ChunkArena(self) if self.buffer_mode == 'arena' else None
+
+        self.gpu_mesher = GPUMesher(self) if self.mesher == 'gpu' else None
+
+        # chunk meshing can run on worker threads against snapshots of the voxel data
+        # finished meshes wait in a queue until the frame loop uploads them (at most upload_cap per frame)
+        # (the gpu mesher runs on the main thread since it needs the context)
+        self.mesh_pool = ThreadPoolExecutor(max_workers=mesh_workers) if mesh_workers and (self.mesher != 'gpu') else None
+        self.finished_meshes = queue.Queue()
+        self.pending_meshes = 0
+        self.upload_cap = upload_cap
+
+        # with a budget (in ms) edits queue their chunks and frame_update() remeshes as many as fit each frame
+        # lod meshes always go through the same queue (as (chunk, factor) pairs) so they never build while drawing
+        # without a budget queued work gets DEFAULT_REBUILD_BUDGET
+        self.rebuild_budget = rebuild_budget
+        self.dirty_chunks = set()
+        self.dirty_lods = set()
+        self.rebuild_cost = 0.0
+        self.lod_cost = 0.0
+        self.rebuild_stats = {'queued': 0, 'rebuilt': 0, 'lods_queued': 0, 'lods_built': 0, 'time_ms': 0.0}
+
+        # chunks are tested against the camera frustum before drawing
+        # with shared_cull the test runs once per frame against a frustum covering both eyes
+        self.frustum_culling = frustum_culling
+        self.shared_cull = shared_cull
+        self.visible_chunks = []
+        self.cull_key = None
+
+        # visible chunks draw nearest first so hidden fragments fail the depth test before shading
+        # the depth pre-pass lays down terrain depth with a trivial fragment shader (see render_depth())
+        # so the shading pass only shades visible terrain, query_stats adds sample and primitive counts to render_stats
+        self.front_to_back = front_to_back
+        self.depth_prepass = depth_prepass
+        self.depth_program = None
+        if self.depth_prepass and (self.buffer_mode != 'arena'):
+            self.depth_program = self.e['MGL'].program(CHUNK_DEPTH_SHADERS[self.vertex_format], DEPTH_FRAGMENT_SHADER)
+        self.depth_key = None
+        self.query_stats = query_stats
+        self.query = self.e['MGL'].ctx.query(samples=True, primitives=True) if query_stats else None
+
+        # occlusion culling flood fills from the camera's chunk through chunk faces that connect through air
+        # so chunks hidden behind solid terrain (caves from the surface and the surface from caves) are skipped
+        self.occlusion_culling = occlusion_culling
+
+        self.reset_render_stats()
+
+        # chunks further than lod_distances[0] (world units) from the eye draw a 2x2x2 downsampled mesh
+        # and past lod_distances[1] a 4x4x4 one
+        self.lod_distances = lod_distances
+
+        # chunks with their center further than far_field_distance (world units) from the eye aren't rasterized
+        # and are raymarched from a brickmap in one full screen pass instead (see FarField)
+        # the brickmap only holds blocks, so their decor is still drawn per chunk
+        self.far_field = FarField(self, far_field_distance, factor=far_field_factor) if far_field_distance else None
+
+        # optional ChunkGenerator that streams in new terrain from frame_update()
+        self.generator = None
+
+        # open WorldEdit (see edit()), add_block and remove_block defer their rebuilds to it
+        self.transaction = None
+
         self.reset_rebuild()
 
         self.pathfinder = Pathfinder(self)
@@ -89,13 +298,236 @@ class World(ElementSingleton):
         
         # add diagonals on level ground
         for pos in list(self.neighbor_map):
-            valid_diagonals = []
-            for diagonal in DIAGONAL_CHECKS:
-                world_diag = (pos[0] + diagonal[0], pos[1] + diagonal[1], pos[2] + diagonal[2])
-                if world_diag in self.neighbor_map:
-                    if any([(pos[0] + offset[0], pos[1] + offset[1], pos[2] + offset[2]) in self.neighbor_map[pos] for offset in DIAGONAL_CHECKS[diagonal]]):
-                        valid_diagonals.append(world_diag)
-            self.neighbor_map[pos] += valid_diagonals
+            self.neighbor_map[pos] += self.diagonal_neighbors(pos)
+
+    def diagonal_neighbors(self, pos):
+        valid_diagonals = []
+        for diagonal in DIAGONAL_CHECKS:
+            world_diag = (pos[0] + diagonal[0], pos[1] + diagonal[1], pos[2] + diagonal[2])
+            if world_diag in self.neighbor_map:
+                if any([(pos[0] + offset[0], pos[1] + offset[1], pos[2] + offset[2]) in self.neighbor_map[pos] for offset in DIAGONAL_CHECKS[diagonal]]):
+                    valid_diagonals.append(world_diag)
+        return valid_diagonals
+
+    def refresh_navmesh(self, world_pos):
+        # re-evaluates the nodes an edit at world_pos could have opened or closed (those using it as floor, body or head)
+        # along with every node next to them so no links to removed nodes are left behind
+        if not self.neighbor_map:
+            return
+        changed = {(world_pos[0], world_pos[1] + dy, world_pos[2]) for dy in (-2, -1, 0, 1)}
+        region = {(pos[0] + dx, pos[1] + dy, pos[2] + dz) for pos in changed for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)}
+
+        # same test as valid_pathing_block() for every node the region and its neighbors can reach, from one solidity read
+        low = (world_pos[0] - 2, world_pos[1] - 5, world_pos[2] - 2)
+        solid = self.solid_region((low, (world_pos[0] + 3, world_pos[1] + 6, world_pos[2] + 3)))
+        standable = solid[:, :-3] & ~solid[:, 1:-2] & ~solid[:, 2:-1] & ~solid[:, 3:]
+        valid = lambda pos: standable[pos[0] - low[0], pos[1] - low[1] - 1, pos[2] - low[2]]
+
+        nodes = []
+        for pos in region:
+            if ((pos in self.neighbor_map) or (pos in changed)) and valid(pos):
+                self.neighbor_map[pos] = [neighbor for neighbor in ((pos[0] + offset[0], pos[1] + offset[1], pos[2] + offset[2]) for offset in VALID_MOVEMENT_DIRECTIONS) if valid(neighbor)]
+                nodes.append(pos)
+            else:
+                self.neighbor_map.pop(pos, None)
+        for pos in nodes:
+            self.neighbor_map[pos] = [neighbor for neighbor in self.neighbor_map[pos] if neighbor in self.neighbor_map]
+            self.neighbor_map[pos] += self.diagonal_neighbors(pos)
+
+    @property
+    def mesh_options(self):
+        return {
+            'vertex_format': self.vertex_format,
+            'greedy': self.greedy,
+            'tile_count': self.tile_count,
+            'indexed': self.indexed,
+        }
+
+    @property
+    def mesher_function(self):
+        return self.mesh_cache.mesh if self.mesh_cache else mesh_chunk
+
+    def submit_mesh(self, chunk, lod=1, snapshot=None):
+        # lod meshes pass their downsampled rows and halo as the snapshot
+        generation = chunk.lod_generation if lod > 1 else chunk.mesh_generation
+        snapshot = chunk.mesh_snapshot() if snapshot is None else snapshot
+        self.pending_meshes += 1
+        future = self.mesh_pool.submit(self.mesher_function, *snapshot, **self.mesh_options)
+        future.add_done_callback(lambda future: self.finished_meshes.put((chunk, lod, generation, future)))
+
+    def upload_meshes(self, max_uploads=None, wait=False):
+        uploads = 0
+        while self.pending_meshes and ((max_uploads is None) or (uploads < max_uploads)):
+            try:
+                chunk, lod, generation, future = self.finished_meshes.get(block=wait)
+            except queue.Empty:
+                break
+
+            self.pending_meshes -= 1
+
+            # a newer mesh has been requested since this one was submitted (stale lods are queued again when drawn)
+            if lod > 1:
+                if generation != chunk.lod_generation:
+                    chunk.queued_lods.discard(lod)
+                    continue
+                chunk.upload_lod(lod, future.result())
+            else:
+                if generation != chunk.mesh_generation:
+                    continue
+                chunk.release()
+                chunk.buffer_from_content(future.result())
+            uploads += 1
+        return uploads
+
+    def flush_meshes(self):
+        # blocks until every submitted mesh is uploaded (used after bulk rebuilds such as startup)
+        self.upload_meshes(wait=True)
+
+    def schedule_rebuild(self, *chunks):
+        self.dirty_chunks.update(chunks)
+
+    def schedule_lod(self, chunk, factor):
+        self.dirty_lods.add((chunk, factor))
+
+    @property
+    def focus_pos(self):
+        return self.e['PlayerBody'].world_pos.pos if 'PlayerBody' in self.e else (0, 0, 0)
+
+    def rebuild_priority(self, chunk):
+        # chunks drawn last frame go first, then the closest to the player
+        origin = self.focus_pos
+        distance = sum((chunk.center[i] - origin[i]) ** 2 for i in range(3))
+        return (chunk.last_rendered < self.frame_index - 1, distance)
+
+    def process_rebuilds(self, budget_ms):
+        # chunk rebuilds go first, then lod meshes (each with its own running cost estimate)
+        start = time.perf_counter()
+        elapsed = 0.0
+        rebuilt = 0
+        lods_built = 0
+        jobs = [(chunk, 1) for chunk in sorted(self.dirty_chunks, key=self.rebuild_priority)]
+        jobs += sorted(self.dirty_lods, key=lambda job: self.rebuild_priority(job[0]))
+        for chunk, lod in jobs:
+            # always make progress, then only start rebuilds that are expected to fit the budget
+            expected = self.lod_cost if lod > 1 else self.rebuild_cost
+            if (rebuilt or lods_built) and (elapsed + expected > budget_ms):
+                break
+            if lod > 1:
+                self.dirty_lods.discard((chunk, lod))
+                chunk.build_lod(lod)
+                lods_built += 1
+            else:
+                self.dirty_chunks.discard(chunk)
+                chunk.rebuild()
+                rebuilt += 1
+
+            cost = (time.perf_counter() - start) * 1000 - elapsed
+            elapsed += cost
+            if lod > 1:
+                self.lod_cost = cost if not self.lod_cost else self.lod_cost * 0.9 + cost * 0.1
+            else:
+                self.rebuild_cost = cost if not self.rebuild_cost else self.rebuild_cost * 0.9 + cost * 0.1
+
+        if rebuilt:
+            self.reset_rebuild()
+
+        self.rebuild_stats = {'queued': len(self.dirty_chunks), 'rebuilt': rebuilt, 'lods_queued': len(self.dirty_lods), 'lods_built': lods_built, 'time_ms': elapsed}
+        return self.rebuild_stats
+
+    def stream_chunks(self):
+        origin = self.focus_pos
+        center = tuple(int((origin[i] / BLOCK_SCALE) // CHUNK_SIZE) for i in range(3))
+        loaded = 0
+        evicted = 0
+
+        # the set of chunks in range only changes when the player crosses a chunk border or chunks are added
+        if (center != self.stream_center) or (len(self.chunks) != self.stream_chunk_count):
+            self.stream_center = center
+            self.stream_chunk_count = len(self.chunks)
+
+            reach = int(math.ceil(self.stream_radius / (CHUNK_SIZE * BLOCK_SCALE)))
+            streamed = set()
+            for x in range(center[0] - reach, center[0] + reach + 1):
+                for y in range(center[1] - reach, center[1] + reach + 1):
+                    for z in range(center[2] - reach, center[2] + reach + 1):
+                        chunk = self.chunks.get((x, y, z))
+                        if chunk and (sum((chunk.center[i] - origin[i]) ** 2 for i in range(3)) <= self.stream_radius ** 2):
+                            streamed.add(chunk)
+
+            for chunk in self.streamed_chunks - streamed:
+                self.evictable_chunks[chunk] = None
+            for chunk in streamed:
+                self.evictable_chunks.pop(chunk, None)
+                if not chunk.resident:
+                    chunk.load()
+                    loaded += 1
+            self.streamed_chunks = streamed
+
+        # evictable_chunks is in least recently streamed order, so only evicting touches it
+        budget = self.vram_budget or 0
+        while self.evictable_chunks and (self.gpu_bytes > budget):
+            self.evictable_chunks.popitem(last=False)[0].unload()
+            evicted += 1
+
+        self.stream_stats = {'resident': self.resident_count, 'loaded': loaded, 'evicted': evicted, 'gpu_bytes': self.gpu_bytes}
+        return self.stream_stats
+
+    def reset_render_stats(self):
+        self.render_stats = {'chunks_drawn': 0, 'chunks_culled': 0, 'chunks_occluded': 0, 'draw_calls': 0, 'cull_tests': 0, 'lod_chunks': 0, 'vertices': 0, 'far_chunks': 0}
+        if self.query_stats:
+            self.render_stats.update({'samples': 0, 'primitives': 0, 'prepass_samples': 0})
+
+    def frame_update(self):
+        self.frame_index += 1
+        self.reset_render_stats()
+
+        if self.generator:
+            self.generator.update()
+
+        if self.stream_radius:
+            self.stream_chunks()
+
+        if self.rebuild_budget or self.dirty_chunks or self.dirty_lods:
+            self.process_rebuilds(self.rebuild_budget or DEFAULT_REBUILD_BUDGET)
+
+        self.upload_meshes(max_uploads=self.upload_cap)
+
+        if self.shared_voxels:
+            self.shared_voxels.sync()
+
+        if self.expanded_chunk_limit is not None:
+            self.compress_cold_chunks(self.expanded_chunk_limit)
+
+    def share_voxels(self, capacity=4096):
+        # starts mirroring the voxels into shared memory, synced every frame_update()
+        # capacity is the starting chunk count, the mirror moves to a bigger segment when the world outgrows it
+        # workers attach with SharedVoxelView(world.shared_voxels.name) (or receive a pickled view)
+        if not self.shared_voxels:
+            self.shared_voxels = SharedVoxels(self, capacity=capacity)
+            self.shared_voxels.sync()
+        return self.shared_voxels
+
+    def delete(self):
+        # the shared mirror is the only thing here that outlives the process
+        if self.shared_voxels:
+            self.shared_voxels.close()
+            self.shared_voxels = None
+        super().delete()
+
+    def voxels_changed(self, chunk):
+        if self.shared_voxels:
+            self.shared_voxels.dirty.add(chunk)
+        if self.far_field:
+            self.far_field.dirty.add(chunk)
+
+    def compress_cold_chunks(self, limit):
+        # least recently read first
+        compressed = 0
+        if len(self.expanded_chunks) > limit:
+            for chunk in sorted(self.expanded_chunks, key=lambda chunk: chunk.voxel_frame)[:len(self.expanded_chunks) - limit]:
+                chunk.compress()
+                compressed += 1
+        return compressed
 
     def reset_rebuild(self):
         self.temp_rebuild = {
@@ -118,9 +550,17 @@ class World(ElementSingleton):
         self.chunks[chunk_id].add_decor(decor)
 
     def get_block(self, world_pos):
-        chunk_id = tuple(int(world_pos[i] // CHUNK_SIZE) for i in range(3))
-        if chunk_id in self.chunks:
-            return self.chunks[chunk_id].get_block(world_pos)
+        chunk = self.chunks.get((int(world_pos[0] // CHUNK_SIZE), int(world_pos[1] // CHUNK_SIZE), int(world_pos[2] // CHUNK_SIZE)))
+        if chunk:
+            return chunk.get_block(world_pos)
+
+    def solid_mask(self, positions):
+        # positions is an (..., 3) int array of block positions, returns whether each one is solid
+        return self.occupancy.solid_mask(positions)
+
+    def solid_region(self, aabb):
+        # aabb is (min block, max block) with max exclusive, returns solidity indexed [x, y, z] from min
+        return self.occupancy.solid_region(aabb)
         
     def valid_pathing_block(self, world_pos):
         base = self.get_block(world_pos)
@@ -158,17 +598,27 @@ class World(ElementSingleton):
     
     # takes floating world pos instead of grid pos
     def nearby_blocks(self, world_pos, radii=(1, 1, 1)):
-        blocks = []
+        # only the solid cells of the region build blocks (in the same x, y, z order as a full scan)
         base_pos = tuple(int(world_pos[i] // BLOCK_SCALE) for i in range(3))
-        for x in range(radii[0] * 2 + 1):
-            for y in range(radii[1] * 2 + 1):
-                for z in range(radii[2] * 2 + 1):
-                    lookup_pos = (base_pos[0] + x - radii[0], base_pos[1] + y - radii[1], base_pos[2] + z - radii[2])
-                    block = self.get_block(lookup_pos)
-                    if block:
-                        blocks.append(block)
-        return blocks
+        low = tuple(base_pos[i] - radii[i] for i in range(3))
+        solid = self.solid_region((low, tuple(base_pos[i] + radii[i] + 1 for i in range(3))))
+        return [self.get_block((low[0] + int(x), low[1] + int(y), low[2] + int(z))) for x, y, z in np.argwhere(solid)]
     
+    def update_slots(self, *world_positions):
+        # the edited blocks and their 6 neighbors, grouped by the chunk that owns them
+        touched = {}
+        positions = {(world_pos[0] + offset[0], world_pos[1] + offset[1], world_pos[2] + offset[2]) for world_pos in world_positions for offset in N7_OFFSETS}
+        for pos in positions:
+            chunk_id = (pos[0] // CHUNK_SIZE, pos[1] // CHUNK_SIZE, pos[2] // CHUNK_SIZE)
+            if (chunk_id in self.chunks) and self.chunks[chunk_id].resident:
+                chunk = self.chunks[chunk_id]
+                if chunk not in touched:
+                    touched[chunk] = []
+                touched[chunk].append(chunk.local_pos(pos))
+
+        for chunk in touched:
+            chunk.update_slots(touched[chunk])
+
     def world_to_block(self, world_pos):
         return tuple(int(world_pos[i] // BLOCK_SCALE) for i in range(3))
     
@@ -178,18 +628,112 @@ class World(ElementSingleton):
         block = self.get_block(base_pos)
         return block
 
+    def edit(self, rebuild=True):
+        # with world.edit() as tx: batches every add/remove inside the block into one rebuild per chunk
+        return WorldEdit(self, rebuild=rebuild)
+
+    def damage_block(self, world_pos, amount=1):
+        # takes durability from the block at world_pos (a block position), returns True when the block breaks
+        block = self.get_block(world_pos)
+        if not block:
+            return False
+        world_pos = block.world_pos
+        damage = self.block_damage.get(world_pos, 0) + amount
+        if damage < BLOCK_DURABILITY[block.block_id]:
+            self.block_damage[world_pos] = damage
+            return False
+
+        if (self.buffer_mode == 'slots') or self.transaction:
+            self.remove_block(world_pos)
+        else:
+            chunk = self.chunks[tuple(world_pos[i] // CHUNK_SIZE for i in range(3))]
+            self.remove_block(world_pos, rebuild=False)
+            self.schedule_rebuild(chunk, *chunk.border_neighbors(world_pos))
+        self.refresh_navmesh(world_pos)
+        return True
+
     def add_block(self, block_id, world_pos, rebuild=True):
         chunk_id = tuple(int(world_pos[i] // CHUNK_SIZE) for i in range(3))
         if chunk_id not in self.chunks:
             self.chunks[chunk_id] = Chunk(self, chunk_id)
+        if self.block_damage:
+            self.block_damage.pop(tuple(world_pos), None)
+
+        if self.transaction:
+            self.transaction.positions.add(tuple(world_pos))
+            rebuild = False
         
         self.chunks[chunk_id].add_block(block_id, world_pos, rebuild=rebuild)
     
     def remove_block(self, world_pos, rebuild=True):
         chunk_id = tuple(int(world_pos[i] // CHUNK_SIZE) for i in range(3))
+        if self.block_damage:
+            self.block_damage.pop(tuple(world_pos), None)
         if chunk_id in self.chunks:
+            if self.transaction:
+                self.transaction.positions.add(tuple(world_pos))
+                rebuild = False
             self.chunks[chunk_id].remove_block(world_pos, rebuild=rebuild)
 
+    def fill_volume(self, volume, origin, rebuild=True):
+        # volume is indexed [x, y, z] from origin and holds BLOCK_MAP ids, -1 leaves existing blocks alone
+        # every chunk is written with one array assignment and rebuilt (or scheduled) once
+        volume = np.asarray(volume)
+        end = tuple(origin[i] + volume.shape[i] for i in range(3))
+        first = tuple(origin[i] // CHUNK_SIZE for i in range(3))
+        last = tuple((end[i] - 1) // CHUNK_SIZE for i in range(3))
+
+        touched = set()
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                for z in range(first[2], last[2] + 1):
+                    chunk_id = (x, y, z)
+                    lo = tuple(max(origin[i], chunk_id[i] * CHUNK_SIZE) for i in range(3))
+                    hi = tuple(min(end[i], (chunk_id[i] + 1) * CHUNK_SIZE) for i in range(3))
+                    rows = volume[lo[0] - origin[0]:hi[0] - origin[0], lo[1] - origin[1]:hi[1] - origin[1], lo[2] - origin[2]:hi[2] - origin[2]]
+                    if not (rows >= 0).any():
+                        continue
+
+                    if chunk_id not in self.chunks:
+                        self.chunks[chunk_id] = Chunk(self, chunk_id)
+                    chunk = self.chunks[chunk_id]
+                    chunk.fill_rows(tuple(slice(lo[i] - chunk_id[i] * CHUNK_SIZE, hi[i] - chunk_id[i] * CHUNK_SIZE) for i in range(3)), rows)
+                    touched.add(chunk)
+
+        if rebuild:
+            self.rebuild_chunks(touched)
+
+        return touched
+
+    def rebuild_chunks(self, chunks, neighbors=True):
+        # rebuilds (or schedules) each chunk once, by default along with its face neighbors
+        # since border faces can be exposed or covered by changes in the chunk
+        dirty = set(chunks)
+        if neighbors:
+            for chunk in chunks:
+                for offset in N6_OFFSETS:
+                    neighbor = self.chunks.get((chunk.chunk_id[0] + offset[0], chunk.chunk_id[1] + offset[1], chunk.chunk_id[2] + offset[2]))
+                    if neighbor:
+                        dirty.add(neighbor)
+
+        if self.rebuild_budget:
+            self.schedule_rebuild(*dirty)
+        else:
+            for chunk in dirty:
+                chunk.rebuild()
+            self.reset_rebuild()
+        return dirty
+
+    def load_heightmap(self, heights, top_id, fill_id, origin, rebuild=True):
+        # heights is indexed [x, z] with the number of blocks in each column starting at origin's y
+        # the top block of every column is top_id and the rest are fill_id
+        heights = np.asarray(heights, dtype=np.int64)
+        levels = np.arange(max(1, int(heights.max())))[None, :, None]
+        columns = heights[:, None, :]
+        volume = np.where(levels < columns - 1, BLOCK_MAP[fill_id], -1)
+        volume = np.where(levels == columns - 1, BLOCK_MAP[top_id], volume)
+        return self.fill_volume(volume, origin, rebuild=rebuild)
+
     def rebuild(self, deltas_only=False):
         for chunk in self.chunks.values():
             chunk.rebuild(deltas_only=deltas_only)
@@ -200,6 +744,177 @@ class World(ElementSingleton):
         for chunk in self.chunks.values():
             chunk.rebuild_decor()
 
+    def save(self, path):
+        save_world(self, path)
+
+    def load(self, path, decor_sources=()):
+        # chunks come back unmeshed with their voxels mapped lazily, call rebuild() and rebuild_decor() after
+        load_world(self, path, decor_sources=decor_sources)
+
+    def memory_report(self):
+        chunks = list(self.chunks.values())
+        solid_blocks = sum(chunk.block_count for chunk in chunks)
+        voxel_bytes = sum(chunk.memory_usage for chunk in chunks)
+        return {
+            'chunks': len(chunks),
+            'solid_blocks': solid_blocks,
+            'voxel_bytes': voxel_bytes,
+            'bytes_per_block': voxel_bytes / max(1, solid_blocks),
+            'expanded_chunks': len(self.expanded_chunks),
+            'compressed_bytes': sum(chunk.compressed_bytes for chunk in chunks),
+            'dense_voxel_bytes': len(chunks) * CHUNK_SIZE ** 3,
+            'vertices': sum(chunk.vertex_count for chunk in chunks),
+            'gpu_bytes': sum(chunk.gpu_memory_usage for chunk in chunks),
+            'arena_bytes': self.arena.memory_usage if self.arena else 0,
+            'far_field_bytes': self.far_field.memory_usage if self.far_field else 0,
+            'gpu_mesher_bytes': self.gpu_mesher.memory_usage if self.gpu_mesher else 0,
+            'resident_chunks': sum(1 for chunk in chunks if chunk.resident),
+        }
+
+    def occlude(self, camera, chunks):
+        start_id = tuple(int((camera.eye_pos[i] / BLOCK_SCALE) // CHUNK_SIZE) for i in range(3))
+        reachable = reachable_chunks(self, start_id)
+        visible = [chunk for chunk in chunks if chunk.chunk_id in reachable]
+        self.render_stats['chunks_occluded'] += len(chunks) - len(visible)
+        return visible
+
+    def cull(self, camera):
+        chunks = [chunk for chunk in self.chunks.values() if chunk.bounds]
+        if self.occlusion_culling and chunks:
+            chunks = self.occlude(camera, chunks)
+        if not (self.frustum_culling and chunks):
+            return chunks
+
+        if self.shared_cull and (getattr(camera, 'prepped_cull_matrix', None) is not None):
+            # XRCamera provides a matrix and margin that cover both eyes
+            frustum = Frustum(camera.prepped_cull_matrix, margin=camera.cull_margin)
+        else:
+            frustum = Frustum(camera.prepped_matrix)
+
+        mins = np.array([chunk.bounds[0] for chunk in chunks])
+        maxs = np.array([chunk.bounds[1] for chunk in chunks])
+        inside = frustum.test_aabbs(mins, maxs)
+        self.render_stats['cull_tests'] += 1
+
+        return [chunk for i, chunk in enumerate(chunks) if inside[i]]
+
+    def lod_level(self, chunk, camera):
+        # downsampling factor for the chunk's mesh (1 for full detail)
+        if not self.lod_distances:
+            return 1
+        distance = math.sqrt(sum((chunk.center[i] - camera.eye_pos[i]) ** 2 for i in range(3)))
+        factor = 1
+        for threshold in self.lod_distances:
+            if distance > threshold:
+                factor *= 2
+        return factor
+
+    def view_key(self, camera):
+        # identifies the current view (XR cameras hand out a new numpy matrix per eye, 2D cameras a tuple)
+        return (self.frame_index, np.asarray(camera.prepped_matrix, dtype=np.float32).tobytes())
+
+    def update_visible(self, camera):
+        # culls once per frame with shared_cull, otherwise once per view
+        cull_key = self.frame_index if self.shared_cull else self.view_key(camera)
+        if cull_key != self.cull_key:
+            self.visible_chunks = self.cull(camera)
+            self.cull_key = cull_key
+
+        # the far field draws everything past its distance
+        eye = camera.eye_pos
+        chunks = self.visible_chunks
+        if self.far_field:
+            limit = self.far_field.distance ** 2
+            chunks = [chunk for chunk in chunks if (chunk.center[0] - eye[0]) ** 2 + (chunk.center[1] - eye[1]) ** 2 + (chunk.center[2] - eye[2]) ** 2 <= limit]
+
+        if not self.front_to_back:
+            return chunks
+        return sorted(chunks, key=lambda chunk: (chunk.center[0] - eye[0]) ** 2 + (chunk.center[1] - eye[1]) ** 2 + (chunk.center[2] - eye[2]) ** 2)
+
+    def measure(self, *keys):
+        # sample and primitive counts of whatever draws inside the block (reading them waits for the GPU)
+        if not self.query_stats:
+            return contextlib.nullcontext()
+        return MeasuredDraws(self, keys)
+
+    def render_depth(self, camera, uniforms={}):
+        # depth only pass over the visible terrain, call before drawing anything else the terrain hides
+        # (render() runs it itself when it hasn't been run for this view yet)
+        chunks = self.update_visible(camera)
+        self.depth_key = self.view_key(camera)
+
+        fbo = self.e['MGL'].ctx.fbo
+        fbo.color_mask = (False, False, False, False)
+        with self.measure('prepass_samples'):
+            if self.arena:
+                uniforms['view_projection'] = camera.prepped_matrix
+                self.arena.render([draw for chunk, lod, draw in self.arena_draws(camera, chunks) if draw], uniforms=uniforms, depth_only=True)
+                self.render_stats['draw_calls'] += 1
+            else:
+                for chunk in chunks:
+                    self.render_stats['draw_calls'] += chunk.render_depth(camera, uniforms=uniforms, lod=self.lod_level(chunk, camera))
+        fbo.color_mask = (True, True, True, True)
+
     def render(self, camera, uniforms={}, decor_uniforms={}):
-        for chunk in self.chunks.values():
-            chunk.render(camera, uniforms=uniforms, decor_uniforms=decor_uniforms)
\ No newline at end of file
+        chunks = self.update_visible(camera)
+        self.render_stats['chunks_culled'] += sum(1 for chunk in self.chunks.values() if chunk.bounds) - len(self.visible_chunks)
+
+        ctx = self.e['MGL'].ctx
+        if self.depth_prepass:
+            if self.depth_key != self.view_key(camera):
+                self.render_depth(camera)
+            # the shading pass matches the pre-pass depth exactly
+            ctx.depth_func = '<='
+
+        with self.measure('samples', 'primitives'):
+            if self.far_field:
+                # drawn first so decor blends over it (its depth comes from the fragment shader either way)
+                self.render_stats['draw_calls'] += self.far_field.render(camera)
+                self.render_stats['far_chunks'] += len(self.visible_chunks) - len(chunks)
+            if self.arena:
+                self.render_arena(camera, chunks, uniforms=uniforms, decor_uniforms=decor_uniforms)
+            else:
+                for chunk in chunks:
+                    lod = self.lod_level(chunk, camera)
+                    draw_calls, vertices = chunk.render(camera, uniforms=uniforms, decor_uniforms=decor_uniforms, lod=lod)
+                    self.render_stats['draw_calls'] += draw_calls
+                    self.render_stats['vertices'] += vertices
+                    self.render_stats['chunks_drawn'] += 1
+                    self.render_stats['lod_chunks'] += lod > 1
+            if self.far_field:
+                self.render_far_decor(camera, chunks, decor_uniforms=decor_uniforms)
+
+        if self.depth_prepass:
+            ctx.depth_func = '<'
+
+    def render_far_decor(self, camera, chunks, decor_uniforms={}):
+        # decor of the visible chunks the far field drew the blocks of, blended over the finished terrain
+        near = set(chunks)
+        for chunk in self.visible_chunks:
+            if chunk not in near:
+                self.render_stats['draw_calls'] += chunk.render_decor(camera, decor_uniforms=decor_uniforms)
+
+    def arena_draws(self, camera, chunks):
+        return [(chunk, lod, chunk.arena_draw(lod)) for chunk, lod in ((chunk, self.lod_level(chunk, camera)) for chunk in chunks)]
+
+    def render_arena(self, camera, chunks, uniforms={}, decor_uniforms={}):
+        # one multi draw indirect call for the terrain of every visible chunk, decor still draws per chunk
+        draws = []
+        for chunk, lod, draw in self.arena_draws(camera, chunks):
+            if draw:
+                draws.append(draw)
+                self.render_stats['vertices'] += draw[1]
+                self.render_stats['lod_chunks'] += lod > 1
+            self.render_stats['chunks_drawn'] += 1
+
+        if draws:
+            uniforms['world_light_pos'] = tuple(camera.light_pos)
+            uniforms['view_projection'] = camera.prepped_matrix
+            uniforms['eye_pos'] = camera.eye_pos
+            uniforms['tile_size'] = self.tile_size
+            self.arena.render(draws, uniforms=uniforms)
+            self.render_stats['draw_calls'] += 1
+
+        # blended decor goes over the finished terrain like it does with per chunk draws
+        for chunk in chunks:
+            self.render_stats['draw_calls'] += chunk.render_decor(camera, decor_uniforms=decor_uniforms)
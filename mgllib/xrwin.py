@@ -29,16 +29,25 @@ class XRCamera(ElementSingleton):
         self.light_pos = [0.1, 1, 0.2]
         self.eye_pos = [0, 0, 0]
 
+        # view projection covering both eyes (set by XRWindow on the first view of each frame)
+        self.cull_matrix = None
+        self.prepped_cull_matrix = None
+        self.cull_margin = 0.0
+
     def cycle(self):
         if type(self.world_matrix) != type(None):
             # take original view matrix -> remove head offset -> apply world transform
             self.prepped_matrix = (self.world_matrix.T @ self.e['XRInput'].head_transform @ np.reshape(self.matrix.as_numpy(), (4, 4))).flatten()
+            if self.cull_matrix is not None:
+                self.prepped_cull_matrix = (self.world_matrix.T @ self.e['XRInput'].head_transform @ np.reshape(self.cull_matrix.as_numpy(), (4, 4))).flatten()
 
             # hacked eye pos (not accurate for separate eye positions; just based on head pos)
             # only used for specular
             self.eye_pos = [self.e['Demo'].player.world_pos.pos[0], self.pos[1] + self.e['Demo'].player.world_pos.pos[1], self.e['Demo'].player.world_pos.pos[2]]
         else:
             self.prepped_matrix = self.matrix.as_numpy()
+            if self.cull_matrix is not None:
+                self.prepped_cull_matrix = self.cull_matrix.as_numpy()
             self.eye_pos = list(self.pos)
 
         self.sky_matrix = self.matrix.as_numpy()
@@ -79,8 +88,34 @@ class XRWindow(ElementSingleton):
 
         self.motion_flags = [0, 1, 0]
 
+        self.near_z = 0.03
+        self.far_z = 200.0
+
+        # last known fov and position of each eye (used to build a frustum covering both)
+        self.view_fovs = {}
+        self.view_positions = {}
+
         #self.mem_check = tracker.SummaryTracker()
 
+    def combined_projection(self):
+        # union of every eye's fov from this eye's pose, the eye separation is covered by XRCamera.cull_margin
+        # (assumes both eyes share an orientation, so headsets with canted displays should not use shared culling)
+        fovs = list(self.view_fovs.values())
+        fov = xr.Fovf(
+            angle_left=min(f.angle_left for f in fovs),
+            angle_right=max(f.angle_right for f in fovs),
+            angle_up=max(f.angle_up for f in fovs),
+            angle_down=min(f.angle_down for f in fovs),
+        )
+        return xr.Matrix4x4f.create_projection_fov(graphics_api=xr.GraphicsAPI.OPENGL, fov=fov, near_z=self.near_z, far_z=self.far_z)
+
+    @property
+    def eye_separation(self):
+        if len(self.view_positions) < 2:
+            return 0.0
+        positions = list(self.view_positions.values())
+        return math.dist(positions[0], positions[1])
+
     def run(self):
         hack_pyopenxr(self.dimensions, self.title)
 
@@ -103,12 +138,16 @@ class XRWindow(ElementSingleton):
 
                 self.input.update(frame_state)
 
+                # upload chunk meshes finished by background workers (capped per frame)
+                if 'World' in self.e:
+                    self.e['World'].frame_update()
+
                 for view_index, view in enumerate(context.view_loop(frame_state)):
                     projection = xr.Matrix4x4f.create_projection_fov(
                         graphics_api=xr.GraphicsAPI.OPENGL,
                         fov=view.fov,
-                        near_z=0.03,
-                        far_z=200.0
+                        near_z=self.near_z,
+                        far_z=self.far_z
                     )
 
                     to_view = xr.Matrix4x4f.create_translation_rotation_scale(
@@ -127,6 +166,12 @@ class XRWindow(ElementSingleton):
                     xrcam.matrix = projection @ new_view
                     xrcam.pos = list(view.pose.position[:3])
 
+                    self.view_fovs[view_index] = view.fov
+                    self.view_positions[view_index] = list(view.pose.position[:3])
+                    if view_index == 0:
+                        xrcam.cull_matrix = self.combined_projection() @ new_view
+                        xrcam.cull_margin = self.eye_separation
+
                     self.xrstate.orientation = view.pose.orientation
 
                     self.application.update(view_index)
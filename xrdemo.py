@@ -1,8 +1,8 @@
+import os
 import sys
 import time
 import math
 import random
-import noise
 
 import pygame
 from OpenGL import GL
@@ -15,8 +15,8 @@ from mgllib.elements import ElementSingleton
 from mgllib.model.obj import OBJ
 from mgllib.camera import Camera
 from mgllib.player_body import PlayerBody
-from mgllib.world.world import World, BLOCK_SCALE
-from mgllib.world.decor import Decor
+from mgllib.world.world import World
+from mgllib.world.generator import ChunkGenerator, TerrainSettings
 from mgllib.skybox import Skybox
 from mgllib.vritem import Knife, M4, Magazine
 from mgllib.model.polygon import Polygon, TETRAHEDRON
@@ -25,6 +25,12 @@ from mgllib.sound import Sounds
 from mgllib.entity import Entity
 from mgllib.hud import HUD
 
+# optional world save directory: loaded when it exists, otherwise written after generating the terrain
+WORLD_SAVE = sys.argv[1] if len(sys.argv) > 1 else None
+
+# generated worlds keep streaming in terrain this far (world units) around the player
+STREAM_RADIUS = 96
+
 class Demo(ElementSingleton):
     def __init__(self):
         super().__init__()
@@ -40,23 +46,31 @@ class Demo(ElementSingleton):
         self.font = pygame.font.Font('data/rubik_medium.ttf', size=28)
 
     def place_monument(self, pos):
-        for y in range(5):
-            self.world.add_block('dirt', (1 + pos[0], y + pos[1] - 1, 1 + pos[2]), rebuild=False)
-            self.world.add_block('dirt', (-1 + pos[0], y + pos[1] - 1, 1 + pos[2]), rebuild=False)
-            self.world.add_block('dirt', (-1 + pos[0], y + pos[1] - 1, -1 + pos[2]), rebuild=False)
-            self.world.add_block('dirt', (1 + pos[0], y + pos[1] - 1, -1 + pos[2]), rebuild=False)
-            
-            t = 'log'
-            if y == 4:
-                t = 'dirt'
-                self.world.add_block('chiseled_stone', (1 + pos[0], y + pos[1] - 1, 0 + pos[2]), rebuild=False)
-                self.world.add_block('chiseled_stone', (0 + pos[0], y + pos[1] - 1, 1 + pos[2]), rebuild=False)
-                self.world.add_block('chiseled_stone', (-1 + pos[0], y + pos[1] - 1, 0 + pos[2]), rebuild=False)
-                self.world.add_block('chiseled_stone', (0 + pos[0], y + pos[1] - 1, -1 + pos[2]), rebuild=False)
-            self.world.add_block(t, (2 + pos[0], y + pos[1] - 1, 2 + pos[2]), rebuild=False)
-            self.world.add_block(t, (-2 + pos[0], y + pos[1] - 1, 2 + pos[2]), rebuild=False)
-            self.world.add_block(t, (-2 + pos[0], y + pos[1] - 1, -2 + pos[2]), rebuild=False)
-            self.world.add_block(t, (2 + pos[0], y + pos[1] - 1, -2 + pos[2]), rebuild=False)
+        # a single transaction rebuilds each chunk the monument touches once
+        with self.world.edit() as tx:
+            for y in range(5):
+                tx.add_block('dirt', (1 + pos[0], y + pos[1] - 1, 1 + pos[2]))
+                tx.add_block('dirt', (-1 + pos[0], y + pos[1] - 1, 1 + pos[2]))
+                tx.add_block('dirt', (-1 + pos[0], y + pos[1] - 1, -1 + pos[2]))
+                tx.add_block('dirt', (1 + pos[0], y + pos[1] - 1, -1 + pos[2]))
+
+                t = 'log'
+                if y == 4:
+                    t = 'dirt'
+                    tx.add_block('chiseled_stone', (1 + pos[0], y + pos[1] - 1, 0 + pos[2]))
+                    tx.add_block('chiseled_stone', (0 + pos[0], y + pos[1] - 1, 1 + pos[2]))
+                    tx.add_block('chiseled_stone', (-1 + pos[0], y + pos[1] - 1, 0 + pos[2]))
+                    tx.add_block('chiseled_stone', (0 + pos[0], y + pos[1] - 1, -1 + pos[2]))
+                tx.add_block(t, (2 + pos[0], y + pos[1] - 1, 2 + pos[2]))
+                tx.add_block(t, (-2 + pos[0], y + pos[1] - 1, 2 + pos[2]))
+                tx.add_block(t, (-2 + pos[0], y + pos[1] - 1, -2 + pos[2]))
+                tx.add_block(t, (2 + pos[0], y + pos[1] - 1, -2 + pos[2]))
+
+    def generate_world(self):
+        # terrain columns are generated in worker processes and spliced into the world here
+        # the startup area is generated up front and the generator stays on the world to stream in the rest
+        generator = ChunkGenerator(self.world, TerrainSettings(seed=random.randrange(1 << 30)), decor_sources=[self.grass_res, self.tree_res], place_monument=self.place_monument, radius=STREAM_RADIUS)
+        generator.generate(generator.columns_in((-64, -64), (64, 64)))
 
     def init_mgl(self):
         self.mgl = MGL()
@@ -108,39 +122,12 @@ class Demo(ElementSingleton):
         self.tracers = []
         self.particles = []
 
-        monuments = []
-        for x in range(128):
-            for z in range(128):
-                height = int((noise.pnoise2(x * 0.08, z * 0.08, octaves=2) * 0.5 + 0.5) * 5 + 1)
-                for y in range(height):
-                    t = 'dirt'
-                    if y == height - 1:
-                        t = 'grass'
-                        if (abs(x) + abs(z)) > 8:
-                            if random.random() < 0.003:
-                                monuments.append((x - 64, y - 5, z - 64))
-                    self.world.add_block(t, (x - 64, y - 6, z - 64), rebuild=False)
-
-        for monument in monuments:
-            self.place_monument(monument)
-
-        for chunk in self.world.chunks.values():
-            for block in chunk.blocks.values():
-                block_pos = block.world_pos
-                if (block.block_id == 'grass') and (not self.world.get_block((block_pos[0], block_pos[1] + 1, block_pos[2]))):
-                    # open grass block
-
-                    height = noise.pnoise2(x * 0.08, z * 0.08, octaves=2) * 0.5 + 0.5
-
-                    if random.random() > height:
-                        if random.random() < 0.5:
-                            p = block.scaled_world_pos
-                            self.world.add_decor(Decor(self.grass_res, (p[0] + BLOCK_SCALE * 0.5, p[1] + BLOCK_SCALE, p[2] + BLOCK_SCALE * 0.5)))
-                    
-                    if random.random() < height: # add trees
-                        if random.random() < 0.03:
-                            p = block.scaled_world_pos
-                            self.world.add_decor(Decor(self.tree_res, (p[0] + BLOCK_SCALE * 0.5, p[1] + BLOCK_SCALE, p[2] + BLOCK_SCALE * 0.5), rot=glm.rotate(random.random() * math.pi * 2, (0, 1, 0))))
+        if WORLD_SAVE and os.path.exists(WORLD_SAVE):
+            self.world.load(WORLD_SAVE, decor_sources=[self.grass_res, self.tree_res])
+        else:
+            self.generate_world()
+            if WORLD_SAVE:
+                self.world.save(WORLD_SAVE)
 
         self.world.rebuild()
         self.world.rebuild_decor()
@@ -203,6 +190,10 @@ class Demo(ElementSingleton):
 
         self.skybox.render(self.e['XRCamera'])
 
+        # terrain depth first so the items and npcs it hides are rejected before shading
+        if self.world.depth_prepass:
+            self.world.render_depth(self.e['XRCamera'])
+
         for item in self.items:
             item.render(self.e['XRCamera'])
 
@@ -231,4 +222,6 @@ class Demo(ElementSingleton):
 
         self.hud.render()
 
-Demo().run()
+# worker processes import this module, so the demo only starts when run directly
+if __name__ == '__main__':
+    Demo().run()